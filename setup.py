@@ -61,6 +61,16 @@ tests_require = [
     'pytest>=2.8.0',
 ]
 
+extras_require = {
+    'crc32c': ['crc32c>=1.0'],
+    'numpy': ['numpy>=1.7'],
+    'tests': tests_require,
+}
+
+extras_require['all'] = []
+for reqs in extras_require.values():
+    extras_require['all'].extend(reqs)
+
 setup(
     name='xrootdfs',
     version=version,
@@ -73,6 +83,7 @@ setup(
     packages=['xrootdfs', ],
     zip_safe=False,
     platforms='any',
+    extras_require=extras_require,
     tests_require=tests_require,
     install_requires=[
         'fs>=0.4.0',
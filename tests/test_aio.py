@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of asyncio interface."""
+
+from __future__ import absolute_import, print_function
+
+from os.path import join
+
+import pytest
+from fs import SEEK_CUR, SEEK_END
+from fs.errors import DestinationExistsError, DirectoryNotEmptyError, \
+    ResourceInvalidError, ResourceNotFoundError, UnsupportedError
+
+from conftest import mkurl
+
+asyncio = pytest.importorskip('asyncio')
+aio = pytest.importorskip('xrootdfs.aio')
+
+
+def run(coro):
+    """Run coroutine in the event loop."""
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def collect(agen):
+    """Collect the items of an asynchronous generator."""
+    items = []
+    while True:
+        try:
+            items.append(run(agen.__anext__()))
+        except StopAsyncIteration:  # noqa
+            return items
+
+
+def test_read(tmppath):
+    """Test reading."""
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        fc = f.read()
+
+    f = run(aio.AsyncXRootDFile.open(mkurl(fp)))
+    assert run(f.read(5)) == fc[:5]
+    assert f.tell() == 5
+    buf = bytearray(3)
+    assert run(f.readinto(buf)) == 3
+    assert bytes(buf) == fc[5:8]
+    assert run(f.seek(-2, SEEK_CUR)) == 6
+    assert run(f.read()) == fc[6:]
+    assert run(f.read()) == b''
+    assert run(f.seek(-3, SEEK_END)) == len(fc) - 3
+    assert run(f.read(10)) == fc[-3:]
+    assert run(f.stat()).size == len(fc)
+    run(f.close())
+    assert f.closed
+    pytest.raises(ValueError, run, f.read())
+
+    # Large reads are split in concurrent requests.
+    f = run(aio.AsyncXRootDFile.open(
+        mkurl(fp), range_size=7, parallel_reads=2))
+    assert run(f.read()) == fc
+    run(f.close())
+
+    pytest.raises(ResourceNotFoundError, run, aio.AsyncXRootDFile.open(
+        mkurl(join(tmppath, 'data/nope'))))
+    pytest.raises(ValueError, run, aio.AsyncXRootDFile.open(mkurl(fp), 'rt'))
+
+
+def test_lines(tmppath):
+    """Test reading lines and asynchronous iteration."""
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        lines = f.read().splitlines(True)
+
+    f = run(aio.AsyncXRootDFile.open(mkurl(fp), buffer_size=8))
+    assert run(f.__aenter__()) is f
+    assert run(f.readline()) == lines[0]
+    assert run(f.read(2)) == lines[1][:2]
+    assert run(f.__anext__()) == lines[1][2:]
+    assert run(f.readlines()) == lines[2:]
+    pytest.raises(StopAsyncIteration, run, f.__anext__())  # noqa
+    run(f.__aexit__(None, None, None))
+    assert f.closed
+
+
+def test_write(tmppath):
+    """Test writing."""
+    fp = join(tmppath, 'data/new.dat')
+    f = run(aio.AsyncXRootDFile.open(mkurl(fp), 'w+b'))
+    assert run(f.write(b'hello')) == 5
+    assert run(f.write(b'world')) == 5
+    run(f.flush())
+    run(f.seek(0))
+    assert run(f.read()) == b'helloworld'
+    run(f.close())
+
+    f = run(aio.AsyncXRootDFile.open(mkurl(fp), 'ab'))
+    run(f.write(b'!'))
+    run(f.close())
+    with open(fp, 'rb') as f:
+        assert f.read() == b'helloworld!'
+
+    f = run(aio.AsyncXRootDFile.open(mkurl(fp), 'rb'))
+    pytest.raises(IOError, run, f.write(b'abc'))
+
+
+def test_fs(tmppath):
+    """Test namespace operations."""
+    fs = aio.AsyncXRootDFS(mkurl(tmppath))
+    assert sorted(run(fs.listdir('data'))) == [
+        'afolder', 'bfolder', 'binary.dat', 'multiline.txt', 'testa.txt']
+    assert sorted(run(fs.listdir('data', dirs_only=True))) == [
+        'afolder', 'bfolder']
+    assert sorted(run(fs.listdir('data', wildcard='*.txt', absolute=True,
+                                 files_only=True))) == \
+        sorted(fs.fs.listdir('data', wildcard='*.txt', absolute=True,
+                             files_only=True))
+    assert sorted(collect(fs.ilistdir('data/afolder'))) == [
+        'afile.txt']
+
+    assert run(fs.exists('data/testa.txt'))
+    assert not run(fs.exists('data/nope'))
+    assert run(fs.isdir('data')) and not run(fs.isdir('data/testa.txt'))
+    assert run(fs.isfile('data/testa.txt')) and not run(fs.isfile('data'))
+    info = run(fs.getinfo('data/testa.txt'))
+    assert info == fs.fs.getinfo('data/testa.txt')
+    pytest.raises(ResourceNotFoundError, run, fs.getinfo('data/nope'))
+    pytest.raises(ResourceNotFoundError, run, fs.listdir('data/nope'))
+
+    assert run(fs.makedir('data/a/b', recursive=True))
+    pytest.raises(DestinationExistsError, run, fs.makedir('data/a'))
+    assert run(fs.makedir('data/a', allow_recreate=True))
+    with open(join(tmppath, 'data/a/b/c.txt'), 'w') as f:
+        f.write('c')
+    pytest.raises(DirectoryNotEmptyError, run, fs.removedir('data/a'))
+    pytest.raises(UnsupportedError, run,
+                  fs.removedir('data/a', recursive=True))
+    assert run(fs.removedir('data/a', force=True))
+    assert not run(fs.exists('data/a'))
+
+    assert run(fs.move('data/testa.txt', 'data/testb.txt'))
+    assert not run(fs.exists('data/testa.txt'))
+    assert run(fs.exists('data/testb.txt'))
+    pytest.raises(ResourceInvalidError, run,
+                  fs.move('data/afolder', 'data/cfolder'))
+    pytest.raises(ResourceNotFoundError, run,
+                  fs.move('data/nope', 'data/cfolder'))
+    assert run(fs.remove('data/testb.txt'))
+    pytest.raises(ResourceNotFoundError, run, fs.remove('data/testb.txt'))
+    pytest.raises(ResourceInvalidError, run, fs.xrd_checksum('data'))
+
+
+def test_walk(tmppath):
+    """Test walking a directory tree."""
+    fs = aio.AsyncXRootDFS(mkurl(tmppath))
+
+    def walk(*args, **kwargs):
+        return collect(fs.walk(*args, **kwargs))
+
+    res = walk('data')
+    assert res[0][0] == 'data'
+    assert sorted(res[0][1]) == ['binary.dat', 'multiline.txt', 'testa.txt']
+    assert sorted(res[1:]) == [
+        ('data/afolder', ['afile.txt']), ('data/bfolder', ['bfile.txt'])]
+
+    res = walk('data', search='depth', wildcard='*.txt',
+               dir_wildcard=lambda p: 'afolder' in p)
+    assert res[0] == ('data/afolder', ['afile.txt'])
+    assert res[1][0] == 'data'
+    assert sorted(res[1][1]) == ['multiline.txt', 'testa.txt']
+
+    pytest.raises(ResourceNotFoundError, walk, 'nope')
+    pytest.raises(ValueError, walk, 'data', search='nope')
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of block caches."""
+
+from __future__ import absolute_import, print_function
+
+import os
+from os.path import exists, join
+
+import pytest
+from mock import Mock
+
+from xrootdfs.cache import INDEX_SAVE_INTERVAL, BlockCache, DiskCache, \
+    DiskCacheEntry, get_block_cache, get_disk_cache, set_block_cache, \
+    set_disk_cache
+
+
+def test_blockcache_lru():
+    """Test LRU eviction and statistics."""
+    cache = BlockCache(max_bytes=10, block_size=4)
+    assert cache.get(('root://a', '//f', 0)) is None
+
+    cache.put(('root://a', '//f', 0), b'aaaa')
+    cache.put(('root://a', '//f', 1), b'bbbb')
+    assert cache.get(('root://a', '//f', 0)) == b'aaaa'
+
+    # Block 1 is least recently used and gets evicted.
+    cache.put(('root://a', '//f', 2), b'cccc')
+    assert cache.get(('root://a', '//f', 1)) is None
+    assert cache.get(('root://a', '//f', 0)) == b'aaaa'
+    assert cache.get(('root://a', '//f', 2)) == b'cccc'
+
+    stats = cache.stats()
+    assert stats['hits'] == 3
+    assert stats['misses'] == 2
+    assert stats['evictions'] == 1
+    assert stats['blocks'] == 2
+    assert stats['bytes'] == 8
+    assert stats['max_bytes'] == 10
+
+    # Replacing a block does not count twice.
+    cache.put(('root://a', '//f', 2), b'dd')
+    assert cache.stats()['bytes'] == 6
+
+    # Blocks larger than the budget are not cached.
+    cache.put(('root://a', '//g', 0), b'x' * 11)
+    assert cache.get(('root://a', '//g', 0)) is None
+
+
+def test_blockcache_invalidate():
+    """Test invalidation of a file."""
+    cache = BlockCache(max_bytes=100, block_size=4)
+    cache.put(('root://a', '//f', 0), b'aaaa')
+    cache.put(('root://a', '//f', 1), b'bbbb')
+    cache.put(('root://a', '//g', 0), b'cccc')
+
+    cache.invalidate('root://a', '//f')
+    assert cache.get(('root://a', '//f', 0)) is None
+    assert cache.get(('root://a', '//f', 1)) is None
+    assert cache.get(('root://a', '//g', 0)) == b'cccc'
+    assert cache.stats()['bytes'] == 4
+
+    cache.invalidate('root://a', '//nope')
+
+    # Blocks of other versions of a file are removed.
+    cache.put(('root://a', '//f', 0), b'aaaa')
+    cache.validate('root://a', '//f', (4, 1))
+    cache.validate('root://a', '//g', (4, 1))
+    assert cache.get(('root://a', '//f', 0)) == b'aaaa'
+    cache.validate('root://a', '//f', (4, 2))
+    assert cache.get(('root://a', '//f', 0)) is None
+    assert cache.get(('root://a', '//g', 0)) == b'cccc'
+    cache.clear()
+    assert cache.stats()['blocks'] == 0
+    assert cache.stats()['bytes'] == 0
+
+
+def test_process_wide_cache():
+    """Test setting the process-wide cache."""
+    assert get_block_cache() is None
+    cache = BlockCache()
+    set_block_cache(cache)
+    try:
+        assert get_block_cache() is cache
+    finally:
+        set_block_cache(None)
+    assert get_block_cache() is None
+
+
+def test_diskcache(tmppath):
+    """Test persistence and validation of disk cache entries."""
+    directory = join(tmppath, 'cache')
+    cache = DiskCache(directory, block_size=4)
+    assert exists(directory)
+
+    entry = cache.entry('root://a', '//f', [10, 1])
+    assert entry.get(0) is None
+    entry.put(2, b'cc')
+    entry.put(0, b'aaaa')
+    assert entry.get(0) == b'aaaa'
+    assert entry.get(1) is None
+    assert entry.get(2) == b'cc'
+    entry.flush()
+
+    # Blocks survive re-opening the cache.
+    entry = DiskCache(directory, block_size=4).entry(
+        'root://a', '//f', [10, 1])
+    assert entry.get(0) == b'aaaa'
+    assert entry.get(2) == b'cc'
+
+    # Blocks of another version of the file are discarded.
+    entry = cache.entry('root://a', '//f', [10, 2])
+    assert entry.get(0) is None
+    assert cache.entry('root://a', '//f', [10, 1]).get(0) is None
+
+    # Blocks stored by other entries are merged into the index.
+    entry1 = cache.entry('root://a', '//g', [8, 1])
+    entry2 = cache.entry('root://a', '//g', [8, 1])
+    entry1.put(0, b'aaaa')
+    entry2.put(1, b'bbbb')
+    entry1.flush()
+    entry2.flush()
+    entry = cache.entry('root://a', '//g', [8, 1])
+    assert entry.get(0) == b'aaaa'
+    assert entry.get(1) == b'bbbb'
+
+    # Invalidated files are removed.
+    cache.invalidate('root://a', '//g')
+    assert cache.entry('root://a', '//g', [8, 1]).get(0) is None
+
+    cache.clear()
+    assert os.listdir(directory) == []
+
+    pytest.raises(ValueError, DiskCache, directory, validate='invalid')
+
+
+def test_diskcache_prune(tmppath):
+    """Test size limit of disk cache."""
+    cache = DiskCache(join(tmppath, 'cache'), block_size=4, max_bytes=10)
+    entry = cache.entry('root://a', '//f', [8, 1])
+    entry.put(0, b'aaaa')
+    entry.put(1, b'bbbb')
+    entry.flush()
+    os.utime(entry.basepath + '.index', (0, 0))
+
+    # Opening a new entry removes the least recently opened files.
+    entry = cache.entry('root://a', '//g', [4, 1])
+    entry.put(0, b'cccc')
+    entry.flush()
+    cache.entry('root://a', '//h', [4, 1])
+    assert cache.entry('root://a', '//f', [8, 1]).get(0) is None
+    assert cache.entry('root://a', '//g', [4, 1]).get(0) == b'cccc'
+
+
+def test_diskcache_index(tmppath, monkeypatch):
+    """Test batched saving of the index and tracking of the size."""
+    cache = DiskCache(join(tmppath, 'cache'), block_size=1, max_bytes=1000)
+    entry = cache.entry('root://a', '//f', [200, 1])
+    saves = []
+    save_index = entry._save_index
+    monkeypatch.setattr(entry, '_save_index',
+                        lambda: saves.append(1) or save_index())
+    for idx in range(INDEX_SAVE_INTERVAL * 2 + 1):
+        entry.put(idx, b'a')
+    assert len(saves) == 2
+    index = DiskCacheEntry.load_index(entry.basepath)
+    assert len(index['blocks']) == INDEX_SAVE_INTERVAL * 2
+    entry.flush()
+    entry.flush()
+    assert len(saves) == 3
+    assert cache._total == INDEX_SAVE_INTERVAL * 2 + 1
+
+    # Opening entries does not rescan the cache below the limit.
+    monkeypatch.setattr(cache, '_scan', Mock(side_effect=AssertionError))
+    cache.entry('root://a', '//g', [4, 1])
+
+
+def test_process_wide_diskcache(tmppath):
+    """Test setting the process-wide disk cache."""
+    assert get_disk_cache() is None
+    cache = DiskCache(join(tmppath, 'cache'))
+    set_disk_cache(cache)
+    try:
+        assert get_disk_cache() is cache
+    finally:
+        set_disk_cache(None)
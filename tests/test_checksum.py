@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of client-side checksums."""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import zlib
+
+import pytest
+from fs.errors import UnsupportedError
+
+from xrootdfs.checksum import Checksum, parse_checksum
+
+
+def test_checksum():
+    """Test incremental checksums."""
+    data = b'0123456789' * 100
+    expected = dict(
+        adler32="{0:08x}".format(zlib.adler32(data) & 0xffffffff),
+        crc32="{0:08x}".format(zlib.crc32(data) & 0xffffffff),
+        md5=hashlib.md5(data).hexdigest(),
+        sha256=hashlib.sha256(data).hexdigest(),
+    )
+    for algorithm, value in expected.items():
+        checksum = Checksum(algorithm)
+        assert checksum.algorithm == algorithm
+        checksum.update(data[:10])
+        checksum.update(bytearray(data[10:500]))
+        checksum.update(memoryview(data)[500:])
+        assert checksum.hexdigest() == value
+
+    assert Checksum('adler32').hexdigest() == '00000001'
+    pytest.raises(UnsupportedError, Checksum, 'nope')
+
+
+def test_crc32c():
+    """Test crc32c checksums."""
+    pytest.importorskip('crc32c')
+    checksum = Checksum('crc32c')
+    checksum.update(b'12345')
+    checksum.update(b'6789')
+    assert checksum.hexdigest() == 'e3069283'
+
+
+def test_parse_checksum():
+    """Test parsing of checksum responses."""
+    assert parse_checksum('adler32 3836a69a\x00') == ('adler32', '3836a69a')
+    assert parse_checksum('md5 abc\n') == ('md5', 'abc')
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of read coalescing."""
+
+from __future__ import absolute_import, print_function
+
+import errno
+import time
+from os.path import join
+
+import pytest
+from mock import Mock
+from XRootD.client.responses import XRootDStatus
+
+from conftest import mkurl
+from xrootdfs import XRootDFile
+from xrootdfs.coalesce import ReadCoalescer
+
+
+def open_file(tmppath):
+    """Open test file with request counting."""
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        fc = f.read()
+    xfile = XRootDFile(mkurl(fp), 'r')
+    xfile._file.read = Mock(wraps=xfile._file.read)
+    xfile._file.vector_read = Mock(wraps=xfile._file.vector_read)
+    return xfile, fc
+
+
+def test_coalesce(tmppath):
+    """Test merging of ranges."""
+    xfile, fc = open_file(tmppath)
+    reads = xfile.coalescer(gap=10, delay=None)
+    assert isinstance(reads, ReadCoalescer)
+
+    chunks = [(50, 5), (0, 10), (5, 10), (20, 5), (100, 5), (140, 100),
+              (200, 10), (7, 0)]
+    futures = [reads.read(offset, size) for offset, size in chunks]
+    assert not any(future.done() for future in futures)
+    assert [future.result() for future in futures] == \
+        [fc[o:o + n] for o, n in chunks]
+    # Merged ranges, truncated at the end of the file, in one request.
+    assert xfile._file.read.call_count == 0
+    assert xfile._file.vector_read.call_count == 1
+    assert xfile._file.vector_read.call_args[1]['chunks'] == \
+        [(0, 25), (50, 5), (100, 5), (140, 5)]
+    assert (reads.reads, reads.requests) == (8, 1)
+
+    # A single merged range is sent as a plain read.
+    futures = [reads.read(o, 4) for o in range(0, 40, 4)]
+    reads.flush()
+    assert b''.join(future.result() for future in futures) == fc[:40]
+    assert xfile._file.read.call_count == 1
+    assert xfile._file.read.call_args[1]['offset'] == 0
+    assert xfile._file.read.call_args[1]['size'] == 40
+
+    # Reads past the end of the file.
+    futures = [reads.read(len(fc) + 5, 5), reads.read(len(fc) + 50, 5)]
+    assert [future.result() for future in futures] == [b'', b'']
+
+    # Without a gap, only overlapping and adjacent ranges are merged.
+    reads = xfile.coalescer(gap=0, delay=None)
+    futures = [reads.read(0, 5), reads.read(5, 5), reads.read(11, 5)]
+    reads.flush()
+    assert [future.result() for future in futures] == \
+        [fc[0:5], fc[5:10], fc[11:16]]
+    assert xfile._file.vector_read.call_args[1]['chunks'] == \
+        [(0, 10), (11, 5)]
+
+
+def test_coalesce_window(tmppath):
+    """Test sending reads after a delay or a number of reads."""
+    xfile, fc = open_file(tmppath)
+
+    reads = xfile.coalescer(delay=0.01)
+    future = reads.read(3, 5)
+    # The timer thread doesn't stat the file, which may be in use.
+    xfile._size = -1
+    xfile._file.stat = Mock(side_effect=AssertionError)
+    for dummy in range(100):
+        if future.done():
+            break
+        time.sleep(0.01)
+    assert future.done()
+    assert future.result() == fc[3:8]
+    del xfile._file.stat
+
+    reads = xfile.coalescer(delay=None, max_reads=3)
+    futures = [reads.read(o, 2) for o in (0, 10, 20)]
+    for future in futures:
+        future.wait(1)
+    assert [future.result() for future in futures] == \
+        [fc[0:2], fc[10:12], fc[20:22]]
+    assert reads.requests == 1
+
+
+def test_coalesce_writes(tmppath):
+    """Test reading data from the write buffer."""
+    fp = join(tmppath, 'data/coalesced.txt')
+    with open(fp, 'wb') as f:
+        f.write(b'0123')
+
+    xfile = XRootDFile(mkurl(fp), 'r+b')
+    xfile.write(b'AB')
+    reads = xfile.coalescer(delay=None)
+    assert reads.read(0, 4).result() == b'AB23'
+    xfile.close()
+
+
+def test_coalesce_errors(tmppath):
+    """Test errors."""
+    xfile, fc = open_file(tmppath)
+    fake_status = {
+        "status": 3,
+        "code": 0,
+        "ok": False,
+        "errno": errno.EREMOTE,
+        "error": True,
+        "message": '[FATAL] Remote I/O Error',
+        "fatal": True,
+        "shellcode": 51
+    }
+    xfile._file.vector_read = Mock(
+        return_value=XRootDStatus(fake_status))
+    reads = xfile.coalescer(gap=0, delay=None)
+    futures = [reads.read(0, 5), reads.read(20, 5)]
+    for future in futures:
+        pytest.raises(IOError, future.result)
+
+    xfile.close()
+    pytest.raises(ValueError, reads.read, 0, 5)
+    pytest.raises(ValueError, xfile.coalescer)
+    pytest.raises(IOError, XRootDFile(
+        mkurl(join(tmppath, 'data/new.txt')), 'w').coalescer)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of streaming decompression."""
+
+from __future__ import absolute_import, print_function
+
+import bz2
+import gzip
+import io
+import zlib
+from os.path import join
+
+import pytest
+from fs.errors import UnsupportedError
+
+from conftest import mkurl
+from xrootdfs import XRootDFS
+from xrootdfs.compression import DecompressedRawIO, open_compressed
+
+
+def write_gzip(path, data):
+    """Write gzip compressed file."""
+    with open(path, 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            gz.write(data)
+
+
+def test_gzip(tmppath):
+    """Test reading gzip compressed files."""
+    with open(join(tmppath, 'data/multiline.txt'), 'rb') as f:
+        contents = f.read()
+    fp = join(tmppath, 'data/multiline.txt.gz')
+    write_gzip(fp, contents)
+    with open(fp, 'rb') as f:
+        compressed = f.read()
+
+    for compression in ['gzip', 'auto']:
+        for kwargs in [dict(), dict(buffer_size=16, readahead=2)]:
+            with open_compressed(mkurl(fp), 'rb', compression=compression,
+                                 **kwargs) as f:
+                assert isinstance(f, io.BufferedReader)
+                assert isinstance(f.raw, DecompressedRawIO)
+                assert f.read(10) == contents[:10]
+                assert f.read() == contents[10:]
+                assert f.read() == b''
+            assert f.raw._file.closed
+
+    # Concatenated streams.
+    with open(fp, 'ab') as f:
+        f.write(compressed)
+    with open_compressed(mkurl(fp), 'rb', buffer_size=16) as f:
+        assert f.read() == contents * 2
+
+    # Text mode.
+    with open_compressed(mkurl(fp), encoding='utf-8') as f:
+        assert isinstance(f, io.TextIOWrapper)
+        assert list(f) == \
+            (contents * 2).decode('utf-8').splitlines(True)
+
+    # Truncated stream.
+    if hasattr(zlib.decompressobj(), 'eof'):
+        with open(fp, 'wb') as f:
+            f.write(compressed[:-10])
+        with open_compressed(mkurl(fp), 'rb') as f:
+            pytest.raises(EOFError, f.read)
+
+
+def test_formats(tmppath):
+    """Test other formats and uncompressed files."""
+    with open(join(tmppath, 'data/multiline.txt'), 'rb') as f:
+        contents = f.read()
+
+    fp = join(tmppath, 'data/multiline.txt.bz2')
+    with open(fp, 'wb') as f:
+        f.write(bz2.compress(contents))
+    for compression in ['bz2', 'auto']:
+        with open_compressed(mkurl(fp), 'rb', compression=compression,
+                             buffer_size=16) as f:
+            assert f.read() == contents
+
+    # Uncompressed files are read as is with auto detection.
+    with open_compressed(mkurl(join(tmppath, 'data/multiline.txt')),
+                         'rb') as f:
+        assert f.read() == contents
+
+    lzma = pytest.importorskip('lzma')
+    fp = join(tmppath, 'data/multiline.txt.xz')
+    with open(fp, 'wb') as f:
+        f.write(lzma.compress(contents))
+    with open_compressed(mkurl(fp), 'rb', buffer_size=16) as f:
+        assert f.read() == contents
+
+
+def test_open(tmppath):
+    """Test XRootDFS.open() with compression."""
+    with open(join(tmppath, 'data/multiline.txt'), 'rb') as f:
+        contents = f.read()
+    write_gzip(join(tmppath, 'data/multiline.txt.gz'), contents)
+
+    fs = XRootDFS(mkurl(tmppath))
+    with fs.open('data/multiline.txt.gz', 'rb', compression='auto') as f:
+        assert f.read() == contents
+    with fs.open('data/multiline.txt.gz', compression='gzip') as f:
+        assert f.readline() == contents.decode('utf-8').splitlines(True)[0]
+
+    pytest.raises(UnsupportedError, fs.open, 'data/multiline.txt.gz', 'wb',
+                  compression='gzip')
+    pytest.raises(UnsupportedError, fs.open, 'data/multiline.txt.gz', 'rb',
+                  compression='zip')
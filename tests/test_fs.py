@@ -10,10 +10,12 @@
 
 from __future__ import absolute_import, print_function
 
+import hashlib
 import os
 import types
 from datetime import datetime
 from functools import wraps
+from io import BytesIO
 from os.path import exists, join
 
 import pytest
@@ -26,6 +28,7 @@ from XRootD.client.responses import XRootDStatus
 
 from conftest import mkurl
 from xrootdfs import XRootDFile, XRootDFS
+from xrootdfs.cache import BlockCache, set_block_cache
 from xrootdfs.utils import spliturl
 
 
@@ -332,6 +335,26 @@ def test_open(tmppath):
     xfile.close()
 
 
+def test_async(tmppath):
+    """Test asynchronous requests."""
+    fs = XRootDFS(mkurl(tmppath))
+
+    assert fs.xrd_stat_async("data/testa.txt").result().size == 10
+    pytest.raises(ResourceNotFoundError,
+                  fs.xrd_stat_async("data/nope").result)
+
+    assert sorted(fs.xrd_dirlist_async("data").result()) == \
+        sorted(fs.listdir("data"))
+    entries = dict(fs.xrd_dirlist_async("data", stat=True).result())
+    assert entries["testa.txt"].size == 10
+    assert fs.isdir("data/afolder", _statobj=entries["afolder"])
+    pytest.raises(ResourceNotFoundError,
+                  fs.xrd_dirlist_async("nope").result)
+
+    with fs.xrd_open_async("data/testa.txt").result() as f:
+        assert f.read() == "testa.txt\n"
+
+
 def _get_content(fs, path):
     f = fs.open(path, 'r')
     content = f.read()
@@ -475,6 +498,133 @@ def test_checksum(tmppath):
     pytest.raises(FSError, fs.xrd_checksum, "data/")
 
 
+def test_download(tmppath):
+    """Test download method."""
+    fs = XRootDFS(mkurl(tmppath))
+    with open(join(tmppath, "data/multiline.txt")) as f:
+        contents = f.read()
+
+    sink = BytesIO()
+    assert fs.xrd_download("data/multiline.txt", sink) == len(contents)
+    assert sink.getvalue() == contents
+
+    # Small chunks are prefetched in the background.
+    sink = BytesIO()
+    assert fs.xrd_download(
+        "data/multiline.txt", sink, chunksize=10, readahead=2) \
+        == len(contents)
+    assert sink.getvalue() == contents
+
+    h = hashlib.md5()
+    fs.xrd_download("data/multiline.txt", h, chunksize=10)
+    assert h.hexdigest() == hashlib.md5(contents).hexdigest()
+
+    chunks = []
+    fs.xrd_download("data/multiline.txt", chunks.append, chunksize=100)
+    assert chunks == [contents[:100], contents[100:]]
+
+    sock = Mock(spec=['sendall'])
+    fs.xrd_download("data/multiline.txt", sock)
+    sock.sendall.assert_called_once_with(contents)
+
+    # Downloads bypass the process-wide caches.
+    cache = BlockCache()
+    set_block_cache(cache)
+    try:
+        fs.xrd_download("data/multiline.txt", BytesIO(), chunksize=10)
+    finally:
+        set_block_cache(None)
+    assert cache.stats()['blocks'] == 0
+
+    assert fs.xrd_download("data/afolder/afile.txt", BytesIO()) == 0
+    pytest.raises(TypeError, fs.xrd_download, "data/multiline.txt", None)
+    pytest.raises(
+        ResourceNotFoundError, fs.xrd_download, "data/nope.txt", BytesIO())
+
+
+def test_read_array(tmppath):
+    """Test reading NumPy arrays."""
+    np = pytest.importorskip('numpy')
+    fs = XRootDFS(mkurl(tmppath))
+    with open(join(tmppath, "data/multiline.txt"), 'rb') as f:
+        contents = f.read()
+
+    for dtype in ['u1', '<i2', '>f4', [('a', '<u2'), ('b', 'S3')]]:
+        expected = np.frombuffer(contents[:len(contents) // np.dtype(
+            dtype).itemsize * np.dtype(dtype).itemsize], dtype=dtype)
+        array = fs.xrd_read_array("data/multiline.txt", dtype)
+        assert array.dtype == np.dtype(dtype)
+        assert array.flags['WRITEABLE']
+        assert array.tobytes() == expected.tobytes()
+
+    # Offsets, counts and concurrent requests.
+    array = fs.xrd_read_array("data/multiline.txt", '<u2', offset=3, count=5,
+                              parallel_reads=3, range_size=4)
+    assert array.tobytes() == contents[3:13]
+    array = fs.xrd_read_array("data/multiline.txt", 'u1', offset=3,
+                              count=len(contents))
+    assert array.tobytes() == contents[3:]
+    assert len(fs.xrd_read_array("data/multiline.txt", 'u1',
+                                 offset=len(contents) + 1)) == 0
+    pytest.raises(ResourceNotFoundError, fs.xrd_read_array, "data/nope",
+                  'u1')
+
+
+def test_follow(tmppath, monkeypatch):
+    """Test following a growing file."""
+    fs = XRootDFS(mkurl(tmppath))
+    fp = join(tmppath, "data/growing.log")
+    with open(fp, "wb") as f:
+        f.write(b"old\n")
+
+    appends = [b"a", b"b\nc", b"", b"", b"\n", b"d"]
+    delays = []
+
+    def sleep(delay):
+        delays.append(delay)
+        if appends:
+            with open(fp, "ab") as f:
+                f.write(appends.pop(0))
+    monkeypatch.setattr("xrootdfs.fs.time", Mock(sleep=sleep))
+
+    lines = list(fs.xrd_follow("data/growing.log", lines=True, interval=1,
+                               max_interval=3, timeout=5))
+    assert lines == [b"ab\n", b"c\n", b"d"]
+    # The interval doubles while the file does not grow.
+    assert delays == [1, 1, 1, 2, 3, 1, 1, 2, 3]
+
+    appends = [b"x" * 10, b"", b"y"]
+    chunks = list(fs.xrd_follow("data/growing.log", from_start=True,
+                                interval=1, timeout=2, chunksize=4))
+    assert b"".join(chunks) == b"old\nab\nc\nd" + b"x" * 10 + b"y"
+    assert max(len(chunk) for chunk in chunks) == 4
+
+    # Truncated files are followed from the start.
+    def truncate(delay):
+        with open(fp, "wb") as f:
+            f.write(b"new")
+    monkeypatch.setattr("xrootdfs.fs.time", Mock(sleep=truncate))
+    follow = fs.xrd_follow("data/growing.log", interval=1, timeout=1)
+    assert next(follow) == b"new"
+
+    # The pending line is dropped when the file is truncated.
+    writes = [b"partial", b"new\n"]
+
+    def rewrite(delay):
+        if writes:
+            with open(fp, "ab" if len(writes) == 2 else "wb") as f:
+                f.write(writes.pop(0))
+    with open(fp, "wb") as f:
+        f.write(b"full line\n")
+    monkeypatch.setattr("xrootdfs.fs.time", Mock(sleep=rewrite))
+    assert list(fs.xrd_follow("data/growing.log", lines=True,
+                              from_start=True, interval=1, timeout=2)) == \
+        [b"full line\n", b"new\n"]
+
+    pytest.raises(ResourceNotFoundError, list,
+                  fs.xrd_follow("data/nope.log", timeout=0))
+
+
 def test_move_good(tmppath):
     """Test move file."""
     fs = XRootDFS(mkurl(tmppath))
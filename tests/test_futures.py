@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of futures for asynchronous requests."""
+
+from __future__ import absolute_import, print_function
+
+import errno
+import threading
+
+import pytest
+from fs.errors import OperationTimeoutError, ResourceNotFoundError
+from mock import Mock
+from XRootD.client.responses import XRootDStatus
+
+from xrootdfs.futures import XRootDFuture, as_completed
+
+
+def mkstatus(ok=True):
+    """Create a status object."""
+    return XRootDStatus({
+        "status": 0 if ok else 3,
+        "code": 0,
+        "ok": ok,
+        "errno": 0 if ok else errno.EREMOTE,
+        "error": not ok,
+        "message": '' if ok else '[FATAL] Remote I/O Error',
+        "fatal": not ok,
+        "shellcode": 0 if ok else 51,
+    })
+
+
+def test_future():
+    """Test result of a future."""
+    future = XRootDFuture(transform=lambda res: res * 2)
+    assert not future.done()
+    pytest.raises(OperationTimeoutError, future.result, timeout=0.01)
+
+    callback = Mock()
+    future.add_done_callback(callback)
+    assert not callback.called
+
+    threading.Timer(0.01, future, (mkstatus(), 21, None)).start()
+    assert future.result() == 42
+    assert future.done()
+    assert future.exception() is None
+    assert future.elapsed >= 0
+    callback.assert_called_once_with(future)
+
+    # Callbacks added later are called immediately.
+    callback = Mock()
+    future.add_done_callback(callback)
+    callback.assert_called_once_with(future)
+
+    # Futures of operations which need no request.
+    future = XRootDFuture.completed(21, transform=lambda res: res * 2)
+    assert future.done()
+    assert future.status.ok
+    assert future.result() == 42
+
+
+def test_future_error():
+    """Test failed requests."""
+    future = XRootDFuture()
+    future(mkstatus(False), None, None)
+    pytest.raises(IOError, future.result)
+    assert isinstance(future.exception(), IOError)
+
+    def errback(status):
+        raise ResourceNotFoundError("path")
+
+    transform = Mock()
+    future = XRootDFuture(errback=errback, transform=transform)
+    future(mkstatus(False), None, None)
+    pytest.raises(ResourceNotFoundError, future.result)
+    assert not transform.called
+
+
+def test_future_submit():
+    """Test submitting requests."""
+    method = Mock(return_value=mkstatus())
+    future = XRootDFuture().submit(method, 'a', offset=1)
+    method.assert_called_once_with('a', offset=1, callback=future)
+    assert not future.done()
+
+    # Failed submission completes the future.
+    method = Mock(return_value=mkstatus(False))
+    future = XRootDFuture().submit(method)
+    assert future.done()
+    pytest.raises(IOError, future.result)
+
+
+def test_as_completed():
+    """Test iterating over futures in order of completion."""
+    futures = [XRootDFuture() for dummy in range(3)]
+    futures[1](mkstatus(), 1, None)
+    threading.Timer(0.05, futures[2], (mkstatus(), 2, None)).start()
+    threading.Timer(0.1, futures[0], (mkstatus(), 0, None)).start()
+    assert [f.result() for f in as_completed(futures)] == [1, 2, 0]
+
+    futures = [XRootDFuture() for dummy in range(2)]
+    futures[1](mkstatus(), 1, None)
+    it = as_completed(futures, timeout=0.01)
+    assert next(it) is futures[1]
+    pytest.raises(OperationTimeoutError, next, it)
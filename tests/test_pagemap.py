@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of paged views."""
+
+from __future__ import absolute_import, print_function
+
+from os.path import join
+
+import pytest
+from mock import Mock
+
+from conftest import mkurl
+from xrootdfs import XRootDFile, XRootDFS
+from xrootdfs.cache import BlockCache
+
+
+def test_pagedview(tmppath):
+    """Test indexing and slicing."""
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        fc = f.read()
+
+    xfile = XRootDFile(mkurl(fp), 'rb')
+    view = xfile.map(cache=BlockCache(max_bytes=64, block_size=8))
+    assert len(view) == len(fc)
+    assert view.tobytes() == fc
+    assert view[0] == fc[0]
+    assert view[-1] == fc[-1]
+    for key in [slice(3, 20), slice(-5, None), slice(None, 4),
+                slice(2, 30, 3), slice(30, 2, -4), slice(None, None, -1),
+                slice(20, 3), slice(len(fc), len(fc) + 10)]:
+        assert view[key] == fc[key]
+    pytest.raises(IndexError, view.__getitem__, len(fc))
+    pytest.raises(IndexError, view.__getitem__, -len(fc) - 1)
+    assert xfile.tell() == 0
+
+    xfile.close()
+    assert view.closed
+    pytest.raises(ValueError, view.__getitem__, 0)
+    pytest.raises(ValueError, xfile.map)
+
+
+def test_pagedview_cache(tmppath):
+    """Test fetching only missing pages."""
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        fc = f.read()
+
+    xfile = XRootDFile(mkurl(fp), 'rb')
+    xfile._file.read = Mock(wraps=xfile._file.read)
+    cache = BlockCache(max_bytes=16, block_size=8)
+    view = xfile.map(cache=cache)
+
+    assert view[2:5] == fc[2:5]
+    assert xfile._file.read.call_count == 1
+    assert view[0:8] == fc[0:8]
+    assert xfile._file.read.call_count == 1
+    # Consecutive missing pages are fetched in one request.
+    assert view[4:20] == fc[4:20]
+    assert xfile._file.read.call_count == 2
+    assert cache.stats()['bytes'] <= 16
+
+    # Defaults to the block cache of the file.
+    cache = BlockCache()
+    assert XRootDFile(mkurl(fp), 'rb', block_cache=cache).map().cache \
+        is cache
+
+
+def test_pagedview_writes(tmppath):
+    """Test reading data from the write buffer."""
+    fp = join(tmppath, 'data/paged.txt')
+    with open(fp, 'wb') as f:
+        f.write(b'0123')
+
+    xfile = XRootDFile(mkurl(fp), 'r+b')
+    xfile.write(b'AB')
+    assert xfile.map()[0:4] == b'AB23'
+    xfile.close()
+
+
+def test_xrd_map(tmppath):
+    """Test XRootDFS.xrd_map()."""
+    fs = XRootDFS(mkurl(tmppath))
+    with fs.xrd_map('data/testa.txt') as view:
+        assert view[:] == b'testa.txt\n'
+    assert view.closed
+    pytest.raises(IOError, XRootDFile(
+        mkurl(join(tmppath, 'data/testa.txt')), 'w-').map)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of raw I/O layer."""
+
+from __future__ import absolute_import, print_function
+
+import io
+from os.path import join
+
+import pytest
+from fs.errors import ResourceNotFoundError
+
+from conftest import mkurl
+from xrootdfs import XRootDFS
+from xrootdfs.rawio import XRootDRawIO, open_io
+
+
+def test_rawio_read(tmppath):
+    """Test reading and seeking with the raw layer."""
+    with open(join(tmppath, 'data/multiline.txt'), 'rb') as f:
+        contents = f.read()
+    url = mkurl(join(tmppath, 'data/multiline.txt'))
+
+    raw = XRootDRawIO(url)
+    assert isinstance(raw, io.RawIOBase)
+    assert raw.readable() and raw.seekable() and not raw.writable()
+    assert raw.name == url
+
+    buf = bytearray(5)
+    assert raw.readinto(buf) == 5
+    assert bytes(buf) == contents[:5]
+    assert raw.tell() == 5
+    assert raw.read(3) == contents[5:8]
+    assert raw.seek(-2, io.SEEK_CUR) == 6
+    assert raw.seek(-3, io.SEEK_END) == len(contents) - 3
+    assert raw.readall() == contents[-3:]
+    assert raw.read(10) == b''
+
+    raw.close()
+    assert raw.closed
+    assert raw._file.closed
+    pytest.raises(ValueError, raw.read, 1)
+
+    pytest.raises(ResourceNotFoundError, XRootDRawIO,
+                  mkurl(join(tmppath, 'data/nope')))
+
+
+def test_rawio_write(tmppath):
+    """Test writing with the raw layer."""
+    url = mkurl(join(tmppath, 'data/new.dat'))
+    raw = XRootDRawIO(url, mode='w+b')
+    assert raw.write(b'hello') == 5
+    assert raw.write(memoryview(b'world')) == 5
+    assert raw.truncate(8) == 8
+    raw.seek(0)
+    assert raw.readall() == b'hellowor'
+    raw.close()
+
+
+def test_open_io_binary(tmppath):
+    """Test buffered binary stack."""
+    with open(join(tmppath, 'data/binary.dat'), 'rb') as f:
+        contents = f.read()
+    url = mkurl(join(tmppath, 'data/binary.dat'))
+
+    with open_io(url, 'rb', buffering=16) as f:
+        assert isinstance(f, io.BufferedReader)
+        assert f.read(10) == contents[:10]
+        assert f.peek(1)[:1] == contents[10:11]
+        f.seek(3)
+        assert f.read() == contents[3:]
+
+    raw = open_io(url, 'rb', buffering=0)
+    assert isinstance(raw, XRootDRawIO)
+    raw.close()
+
+    url = mkurl(join(tmppath, 'data/new.dat'))
+    with open_io(url, 'wb') as f:
+        assert isinstance(f, io.BufferedWriter)
+        f.write(b'abc')
+        f.write(b'def')
+    with open_io(url, 'r+b') as f:
+        assert isinstance(f, io.BufferedRandom)
+        assert f.read() == b'abcdef'
+        f.seek(1)
+        f.write(b'X')
+    with open_io(url, 'ab') as f:
+        f.write(b'gh')
+    with open_io(url, 'rb') as f:
+        assert f.read() == b'aXcdefgh'
+
+    # Flushed data is visible to other readers.
+    with open_io(url, 'wb', buffering=4) as f:
+        f.write(b'flushed')
+        f.flush()
+        with open_io(url, 'rb') as other:
+            assert other.read() == b'flushed'
+    with open_io(url, 'w', encoding='utf-8') as f:
+        f.write(u'text')
+        f.flush()
+        with open(join(tmppath, 'data/new.dat'), 'rb') as other:
+            assert other.read() == b'text'
+
+
+def test_open_io_text(tmppath):
+    """Test text stack."""
+    with open(join(tmppath, 'data/multiline.txt'), 'rb') as f:
+        lines = f.read().decode('utf-8').splitlines(True)
+    url = mkurl(join(tmppath, 'data/multiline.txt'))
+
+    with open_io(url, encoding='utf-8') as f:
+        assert isinstance(f, io.TextIOWrapper)
+        assert f.readline() == lines[0]
+        assert list(f) == lines[1:]
+
+    url = mkurl(join(tmppath, 'data/new.txt'))
+    with open_io(url, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write(u'\xe6\xf8\xe5\nb\n')
+    with open(join(tmppath, 'data/new.txt'), 'rb') as f:
+        assert f.read() == u'\xe6\xf8\xe5\r\nb\r\n'.encode('utf-8')
+    with open_io(url, 'rt', encoding='utf-8') as f:
+        assert f.readlines() == [u'\xe6\xf8\xe5\n', u'b\n']
+
+    pytest.raises(ValueError, open_io, url, 'rbt')
+    pytest.raises(ValueError, open_io, url, 'r', buffering=0)
+    pytest.raises(ValueError, open_io, url, 'rb', encoding='utf-8')
+
+
+def test_open_io_stack(tmppath):
+    """Test XRootDFS.open() returning the io stack."""
+    fs = XRootDFS(mkurl(tmppath))
+    with fs.open('data/testa.txt', 'rb', io_stack=True) as f:
+        assert isinstance(f, io.BufferedReader)
+        assert f.read() == b'testa.txt\n'
+    with fs.open('data/testa.txt', io_stack=True, readahead=2) as f:
+        assert isinstance(f, io.TextIOWrapper)
+        assert f.buffer.raw._file._readahead is not None
+        assert f.read() == u'testa.txt\n'
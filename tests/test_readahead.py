@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of read-ahead."""
+
+from __future__ import absolute_import, print_function
+
+from xrootdfs.readahead import AdaptiveTuner
+
+
+def test_adaptivetuner():
+    """Test chunk size and window adaption."""
+    kb = 1024
+    tuner = AdaptiveTuner(64*kb, min_chunksize=64*kb, max_chunksize=1024*kb,
+                          max_window=8)
+    assert tuner.chunksize == 64*kb
+    assert tuner.window == 1
+    assert tuner.bdp is None
+
+    # Latency bound requests double the chunk size.
+    tuner.update(64*kb, 0.01)
+    assert tuner.chunksize == 128*kb
+    assert tuner.rtt == 0.01
+    tuner.update(128*kb, 0.011)
+    assert tuner.chunksize == 256*kb
+
+    # Requests of an old chunk size do not grow the chunk size further.
+    tuner.update(128*kb, 0.011)
+    assert tuner.chunksize == 256*kb
+
+    # Bandwidth bound requests keep the chunk size.
+    tuner.update(256*kb, 0.03)
+    assert tuner.chunksize == 256*kb
+
+    # Slow requests halve the chunk size.
+    tuner.update(256*kb, 0.05)
+    assert tuner.chunksize == 128*kb
+    assert tuner.bdp == int(128*kb / 0.011 * 0.01)
+    assert tuner.window == 1
+
+    # Invalid samples are ignored.
+    tuner.update(0, 0.01)
+    tuner.update(64*kb, 0)
+    assert tuner.chunksize == 128*kb
+
+
+def test_adaptivetuner_limits():
+    """Test limits of chunk size and window."""
+    kb = 1024
+    tuner = AdaptiveTuner(1, min_chunksize=64*kb, max_chunksize=256*kb,
+                          max_window=4)
+    assert tuner.chunksize == 64*kb
+
+    for i in range(10):
+        tuner.update(tuner.chunksize, 0.1)
+    assert tuner.chunksize == 256*kb
+    assert tuner.bdp == 256*kb
+    assert tuner.window == 1
+
+    # A large bandwidth-delay product is covered by a deeper window.
+    tuner.update(256*kb, 0.01)
+    assert tuner.bdp == int(256*kb / 0.01 * 0.01)
+    tuner.update(64*kb, 1.0)
+    assert tuner.chunksize == 128*kb
+    assert tuner.window == 2
+
+    for i in range(10):
+        tuner.update(tuner.chunksize, 10.0)
+    assert tuner.chunksize == 64*kb
+    assert tuner.window == 4
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Test of retrying failed requests."""
+
+from __future__ import absolute_import, print_function
+
+import errno
+import time
+from os.path import join
+
+import pytest
+from fs.errors import ResourceNotFoundError
+from mock import Mock
+from XRootD.client.responses import XRootDStatus
+
+from conftest import mkurl
+from xrootdfs import XRootDFile
+from xrootdfs.retry import RetryPolicy, is_transient
+
+
+def make_status(code, errno_):
+    """Make status of a failed request."""
+    return XRootDStatus({
+        "status": 1,
+        "code": code,
+        "ok": False,
+        "errno": errno_,
+        "error": True,
+        "message": '[ERROR] Failed',
+        "fatal": False,
+        "shellcode": 54
+    })
+
+
+#: Status of an operation which expired (e.g. after a disconnection).
+EXPIRED = make_status(206, 0)
+
+
+def test_policy():
+    """Test backoff delays and transient errors."""
+    policy = RetryPolicy(retries=4, backoff=1, factor=2, max_backoff=3,
+                         jitter=0)
+    assert list(policy.delays()) == [1, 2, 3, 3]
+    delays = list(RetryPolicy(retries=20, backoff=4, max_backoff=4,
+                              jitter=0.5).delays())
+    assert len(delays) == 20
+    assert all(2 <= d <= 4 for d in delays)
+    assert len(set(delays)) > 1
+    assert list(RetryPolicy(retries=0).delays()) == []
+
+    assert is_transient(EXPIRED)
+    assert is_transient(make_status(400, 3024))
+    assert not is_transient(make_status(400, 3011))
+    assert not is_transient(make_status(0, errno.EREMOTE))
+
+
+def test_retry_read(tmppath, monkeypatch):
+    """Test resuming reads on a reopened file."""
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        fc = f.read()
+    delays = []
+    monkeypatch.setattr("xrootdfs.xrdfile.time",
+                        Mock(sleep=delays.append, time=time.time))
+
+    xfile = XRootDFile(mkurl(fp), 'rb', buffer_size=10, block_cache=False,
+                       retry=RetryPolicy(backoff=2, jitter=0))
+    assert xfile.read(10) == fc[:10]
+    handle = xfile._file
+    handle.read = Mock(return_value=(EXPIRED, None))
+    assert xfile.read(10) == fc[10:20]
+    assert handle.read.call_count == 1
+    assert xfile._file is not handle
+    assert delays == [2]
+    assert xfile.read() == fc[20:]
+
+    # Vector reads and concurrent reads.
+    xfile._file.vector_read = Mock(return_value=(EXPIRED, None))
+    assert xfile.readv([(0, 5), (20, 5)]) == [fc[0:5], fc[20:25]]
+
+    def expired(**kwargs):
+        callback = kwargs.get('callback')
+        if callback is None:
+            return EXPIRED, None
+        callback(EXPIRED, None, None)
+        return EXPIRED
+    xfile.range_size = 40
+    handle = xfile._file
+    handle.read = Mock(side_effect=expired)
+    xfile._reopen = Mock(wraps=xfile._reopen)
+    xfile.seek(0)
+    assert xfile.read() == fc
+    # Each of the concurrent requests is retried, on a single reopened file.
+    assert handle.read.call_count == 4
+    assert xfile._reopen.call_count == 1
+    assert delays == [2] * 6
+
+    # Other errors are not retried.
+    xfile._file.read = Mock(return_value=(make_status(400, 3011), None))
+    xfile.seek(0)
+    pytest.raises(ResourceNotFoundError, xfile.read, 10)
+    assert len(delays) == 6
+
+    # Retries are given up after the number of retries of the policy.
+    xfile._reopen = Mock(return_value=(EXPIRED, None))
+    xfile._file.read = Mock(return_value=(EXPIRED, None))
+    pytest.raises(IOError, xfile.read, 10)
+    assert xfile._reopen.call_count == 5
+    assert delays[6:] == [2, 4, 8, 16, 32]
+
+    # Without a policy, errors are raised right away.
+    xfile = XRootDFile(mkurl(fp), 'rb')
+    xfile._file.read = Mock(return_value=(EXPIRED, None))
+    pytest.raises(IOError, xfile.read, 10)
+    assert XRootDFile(mkurl(fp), 'rb', retry=3).retry.retries == 3
+
+
+def test_retry_write(tmppath, monkeypatch):
+    """Test resuming writes on a reopened file."""
+    monkeypatch.setattr("xrootdfs.xrdfile.time",
+                        Mock(sleep=Mock(), time=time.time))
+    fp = join(tmppath, 'data/retried.txt')
+    xfile = XRootDFile(mkurl(fp), 'wb', retry=1)
+    xfile.write(b'first ')
+    xfile._file.write = Mock(return_value=(EXPIRED, None))
+    xfile.write(b'second')
+    xfile._file.sync = Mock(return_value=(EXPIRED, None))
+    xfile.flush()
+    xfile.close()
+    # The reopened file is not truncated.
+    with open(fp, 'rb') as f:
+        assert f.read() == b'first second'
+
+
+def test_retry_open(tmppath, monkeypatch):
+    """Test retrying opening a file."""
+    monkeypatch.setattr("xrootdfs.xrdfile.time",
+                        Mock(sleep=Mock(), time=time.time))
+    fp = join(tmppath, 'data/multiline.txt')
+    opens = []
+    original = XRootDFile._reopen
+
+    def reopen(self, flags):
+        opens.append(flags)
+        return original(self, flags)
+    monkeypatch.setattr(XRootDFile, "_reopen", reopen)
+
+    handle = Mock(open=Mock(return_value=(EXPIRED, None)))
+    monkeypatch.setattr("xrootdfs.xrdfile.File", Mock(return_value=handle))
+    pytest.raises(IOError, XRootDFile, mkurl(fp), 'r', retry=2)
+    assert len(opens) == 2
+
+    # Missing files are not retried.
+    monkeypatch.undo()
+    monkeypatch.setattr("xrootdfs.xrdfile.time",
+                        Mock(sleep=Mock(), time=time.time))
+    pytest.raises(ResourceNotFoundError, XRootDFile,
+                  mkurl(join(tmppath, 'data/missing.txt')), 'r', retry=2)
@@ -10,9 +10,10 @@
 
 from __future__ import absolute_import, print_function
 
+import pytest
 from XRootD.client.flags import OpenFlags
 
-from xrootdfs.utils import is_valid_path, spliturl, \
+from xrootdfs.utils import byteview, is_valid_path, spliturl, \
     translate_file_mode_to_flags
 
 
@@ -62,3 +63,15 @@ def test_translate_file_mode_to_flags():
     assert translate_file_mode_to_flags('w') == OpenFlags.DELETE
     assert translate_file_mode_to_flags('w-') == OpenFlags.DELETE
     assert translate_file_mode_to_flags('w+') == OpenFlags.DELETE
+
+
+def test_byteview():
+    """Test byte memoryview of buffers."""
+    buf = bytearray(b'abcd')
+    view = byteview(buf)
+    assert view.format == 'B' and view.ndim == 1
+    view[1:3] = b'xy'
+    assert buf == bytearray(b'axyd')
+
+    assert byteview(memoryview(buf)[1:3]).tobytes() == b'xy'
+    pytest.raises(TypeError, byteview, b'immutable')
@@ -11,8 +11,10 @@
 from __future__ import absolute_import, print_function
 
 import errno
+import hashlib
 import math
 import sys
+import zlib
 from os.path import join
 
 import fs.path
@@ -22,10 +24,13 @@ from fs.errors import InvalidPathError, PathError, ResourceNotFoundError, \
     UnsupportedError
 from fs.opener import fsopendir, opener
 from mock import Mock
+from six import text_type
 from XRootD.client.responses import XRootDStatus
 
 from conftest import mkurl
-from xrootdfs import XRootDFile
+from xrootdfs import XRootDFile, xrdfile
+from xrootdfs.cache import BlockCache, DiskCache, set_block_cache, \
+    set_disk_cache
 from xrootdfs.utils import is_valid_path, is_valid_url
 
 
@@ -211,7 +216,7 @@ def test_size(tmppath):
         "shellcode": 51
     }
     xfile.close()
-    xfile = XRootDFile(mkurl(full_path))
+    xfile = XRootDFile(mkurl(full_path), lazy=True)
     xfile._file.stat = Mock(return_value=(XRootDStatus(fake_status), None))
     try:
         xfile.size
@@ -583,7 +588,138 @@ def test_write(tmppath):
         "shellcode": 51
     }
     xfile._file.write = Mock(return_value=(XRootDStatus(fake_status), None))
-    pytest.raises(IOError, xfile.write, '')
+    pytest.raises(IOError, xfile.write, 'x', True)
+
+
+def test_write_buffer(tmppath):
+    """Test buffering of writes."""
+    fp = join(tmppath, 'data/buffered.txt')
+
+    def contents():
+        with open(fp, 'rb') as f:
+            return f.read()
+
+    xfile = XRootDFile(mkurl(fp), 'wb+', write_buffer_size=10)
+    xfile._file.write = Mock(wraps=xfile._file.write)
+    xfile.write(b'abc')
+    xfile.write(b'def')
+    assert xfile.tell() == 6 and xfile.size == 6
+    assert xfile._file.write.call_count == 0
+    assert contents() == b''
+    # Full chunks are sent aligned to multiples of the buffer size.
+    xfile.write(b'ghijklmnopqrstuvwxy')
+    assert xfile._file.write.call_count == 1
+    assert xfile._file.write.call_args[1]['offset'] == 0
+    assert contents() == b'abcdefghijklmnopqrst'
+    xfile.flush()
+    assert contents() == b'abcdefghijklmnopqrstuvwxy'
+
+    # Reads, seeks and truncates send the buffered data first.
+    xfile.write(b'z')
+    xfile.seek(0)
+    assert xfile.read(3) == b'abc'
+    xfile.seek(xfile.size)
+    xfile.write(b'0')
+    xfile.seek(0, 2)
+    assert xfile._wbuffer == bytearray(b'0')
+    xfile.seek(1)
+    assert contents() == b'abcdefghijklmnopqrstuvwxyz0'
+    xfile.write(b'B')
+    xfile.truncate(5)
+    assert contents() == b'aBcde'
+    # Non-contiguous writes.
+    xfile.seek(0)
+    xfile.write(b'A')
+    xfile.seek(3, 1)
+    xfile.write(b'E')
+    assert xfile._wbuffer == bytearray(b'E')
+    xfile.close()
+    assert contents() == b'ABcdE'
+
+    # Appending.
+    xfile = XRootDFile(mkurl(fp), 'a', write_buffer_size=10)
+    xfile._file.write = Mock(wraps=xfile._file.write)
+    xfile.writelines([b'fg', b'hi', b'j'])
+    assert xfile._file.write.call_count == 0
+    xfile.writelines([b'klmnopq'])
+    assert xfile._file.write.call_count == 1
+    assert xfile._file.write.call_args[1]['offset'] == 5
+    assert xfile._wbuffer == bytearray(b'klmnopq')
+    xfile.close()
+    assert contents() == b'ABcdEfghijklmnopq'
+
+    # Without buffering.
+    for kwargs in [dict(buffering=0), dict(write_buffer_size=0)]:
+        xfile = XRootDFile(mkurl(fp), 'wb', **kwargs)
+        xfile.write(b'abc')
+        assert contents() == b'abc'
+        xfile.close()
+
+    # Errors are raised when the buffer is sent.
+    fake_status = {
+        "status": 3,
+        "code": 0,
+        "ok": False,
+        "errno": errno.EREMOTE,
+        "error": True,
+        "message": '[FATAL] Remote I/O Error',
+        "fatal": True,
+        "shellcode": 51
+    }
+    xfile = XRootDFile(mkurl(fp), 'wb')
+    xfile.write(b'abc')
+    handle = xfile._file
+    handle.write = Mock(return_value=(XRootDStatus(fake_status), None))
+    pytest.raises(IOError, xfile.close)
+    assert xfile.closed
+
+
+def test_write_window(tmppath):
+    """Test asynchronous writes of the write buffer."""
+    fp = join(tmppath, 'data/pipelined.txt')
+    data = b''.join(b'%02d' % i for i in range(50))
+
+    xfile = XRootDFile(mkurl(fp), 'wb', write_buffer_size=8, write_window=2)
+    xfile._file.write = Mock(wraps=xfile._file.write)
+    for i in range(0, len(data), 3):
+        xfile.write(data[i:i + 3])
+        assert len(xfile._writes) <= 2
+    xfile.close()
+    with open(fp, 'rb') as f:
+        assert f.read() == data
+    calls = xfile._file.write.call_args_list
+    # Full chunks are written asynchronously, the rest on close.
+    assert [c[1]['offset'] for c in calls] == list(range(0, 96, 8)) + [96]
+    assert all('callback' in c[1] for c in calls[:-1])
+    assert 'callback' not in calls[-1][1]
+
+    # Errors are raised by the next call.
+    fake_status = XRootDStatus({
+        "status": 3,
+        "code": 0,
+        "ok": False,
+        "errno": errno.EREMOTE,
+        "error": True,
+        "message": '[FATAL] Remote I/O Error',
+        "fatal": True,
+        "shellcode": 51
+    })
+
+    def failing(data, offset, callback):
+        callback(fake_status, None, None)
+        return XRootDStatus({"status": 0, "code": 0, "ok": True,
+                             "errno": 0, "error": False, "message": '',
+                             "fatal": False, "shellcode": 0})
+
+    xfile = XRootDFile(mkurl(fp), 'wb', write_buffer_size=8, write_window=2)
+    xfile._file.write = Mock(side_effect=failing)
+    xfile.write(data[:10])
+    assert len(xfile._writes) == 1
+    pytest.raises(IOError, xfile.write, b'x')
+    assert not xfile._writes
+    xfile.write(data[:10])
+    pytest.raises(IOError, xfile.close)
+    assert xfile.closed
 
 
 def test_readwrite_unicode(tmppath):
@@ -946,6 +1082,313 @@ def test_write_binary(tmppath):
     xf_new.close()
 
 
+def test_read_readahead(tmppath):
+    """Test read() with read-ahead enabled."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+
+    xfile = XRootDFile(mkurl(fp), 'r', buffer_size=16, readahead=3)
+    assert xfile._readahead
+    chunks = []
+    while True:
+        data = xfile.read(10)
+        if not data:
+            break
+        chunks.append(data)
+    assert "".join(chunks) == fc
+    assert xfile.tell() == len(fc)
+
+    # Random access falls back to direct reads.
+    xfile.seek(5)
+    assert xfile.read(20) == fc[5:25]
+    assert xfile.read(20) == fc[25:45]
+    xfile.seek(3)
+    assert xfile.read(40) == fc[3:43]
+    xfile.seek(0)
+    assert xfile.readline() == fc[:fc.find('\n')+1]
+    xfile.close()
+
+    # Streamed reads are prefetched from the first read.
+    xfile = XRootDFile(mkurl(fp), 'r-', buffer_size=16, readahead=2)
+    assert xfile.read(100) == fc[:100]
+    assert xfile.read(100) == fc[100:]
+    assert xfile.read(100) == ''
+    xfile.close()
+
+    # Writes invalidate prefetched data.
+    xfile = XRootDFile(mkurl(fp), 'r+', buffer_size=16, readahead=2)
+    assert xfile.read(10) == fc[:10]
+    assert xfile.read(10) == fc[10:20]
+    xfile.write('XXXX')
+    xfile.seek(20)
+    assert xfile.read(4) == 'XXXX'
+    assert xfile.read(4) == fc[24:28]
+    xfile.close()
+
+    # Failing prefetch requests fall back to a direct read.
+    fake_status = {
+        "status": 3,
+        "code": 0,
+        "ok": False,
+        "errno": errno.EREMOTE,
+        "error": True,
+        "message": '[FATAL] Remote I/O Error',
+        "fatal": True,
+        "shellcode": 51
+    }
+    xfile = XRootDFile(mkurl(fp), 'r-', buffer_size=16, readahead=2)
+    realread = xfile._file.read
+
+    def failing_read(offset=0, size=0, timeout=0, callback=None):
+        if callback:
+            return XRootDStatus(fake_status)
+        return realread(offset=offset, size=size)
+    xfile._file.read = Mock(side_effect=failing_read)
+    assert xfile.read(20) == fc[:20]
+
+
+def test_read_blockcache(tmppath):
+    """Test read() through a block cache."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    cache = BlockCache(max_bytes=1024, block_size=16)
+
+    xfile = XRootDFile(mkurl(fp), 'r', block_cache=cache)
+    assert xfile.read(20) == fc[:20]
+    assert cache.stats()['misses'] == 2
+    xfile.seek(5)
+    assert xfile.read(20) == fc[5:25]
+    assert cache.stats()['hits'] == 2
+    assert xfile.read() == fc[25:]
+    xfile.close()
+
+    # Other files share the cached blocks.
+    xfile = XRootDFile(mkurl(fp), 'r', block_cache=cache)
+    xfile._file.read = Mock(side_effect=AssertionError)
+    assert xfile.read() == fc
+    assert xfile.readline() == ''
+    xfile.close()
+
+    # Files modified by other means are not served from the cache.
+    with open(fp, 'wb') as f:
+        f.write(b'changed' + fc)
+    xfile = XRootDFile(mkurl(fp), 'r', block_cache=cache)
+    assert xfile.size == len(fc) + 7
+    assert xfile.read() == b'changed' + fc
+    xfile.close()
+    with open(fp, 'wb') as f:
+        f.write(fc)
+
+    # Process-wide cache is used for read-only files only.
+    set_block_cache(cache)
+    try:
+        assert XRootDFile(mkurl(fp), 'r')._block_cache is cache
+        assert XRootDFile(mkurl(fp), 'r', block_cache=False)._block_cache \
+            is None
+        xfile = XRootDFile(mkurl(fp), 'r+')
+        assert xfile._block_cache is None
+
+        # Writes invalidate cached blocks.
+        xfile.write('XXXX')
+        xfile.close()
+        assert cache.stats()['blocks'] == 0
+        xfile = XRootDFile(mkurl(fp), 'r')
+        assert xfile.read(6) == 'XXXX' + fc[4:6]
+    finally:
+        set_block_cache(None)
+
+
+def test_read_diskcache(tmppath):
+    """Test read() through a disk cache."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    cache = DiskCache(join(tmppath, 'cache'), block_size=16)
+
+    xfile = XRootDFile(mkurl(fp), 'r', disk_cache=cache)
+    assert xfile._disk_cache
+    assert xfile.read(20) == fc[:20]
+    assert xfile.read() == fc[20:]
+    xfile.close()
+
+    # Cached blocks are read from disk.
+    xfile = XRootDFile(mkurl(fp), 'r', disk_cache=cache)
+    xfile._file.read = Mock(side_effect=AssertionError)
+    assert xfile.read() == fc
+    xfile.seek(7)
+    assert xfile.read(30) == fc[7:37]
+    xfile.close()
+
+    # Modified files are not served from the cache.
+    with open(fp, 'w') as f:
+        f.write('changed')
+    xfile = XRootDFile(mkurl(fp), 'r', disk_cache=cache)
+    assert xfile.read() == 'changed'
+    xfile.close()
+
+    # Process-wide cache is used for read-only files only.
+    set_disk_cache(cache)
+    try:
+        assert XRootDFile(mkurl(fp), 'r')._disk_cache
+        assert XRootDFile(mkurl(fp), 'r', disk_cache=False)._disk_cache \
+            is None
+        assert XRootDFile(mkurl(fp), 'r+')._disk_cache is None
+    finally:
+        set_disk_cache(None)
+
+    # Writes invalidate cached blocks, even if the size and modification
+    # time of the file do not change.
+    with open(fp, 'wb') as f:
+        f.write(b'A' * 10)
+    for kwargs in [dict(disk_cache=cache), dict()]:
+        xfile = XRootDFile(mkurl(fp), 'r', disk_cache=cache)
+        assert xfile.read() == b'A' * 10
+        xfile.close()
+        set_disk_cache(cache)
+        try:
+            xfile = XRootDFile(mkurl(fp), 'r+', **kwargs)
+            xfile.write(b'B' * 10)
+            xfile.close()
+        finally:
+            set_disk_cache(None)
+        xfile = XRootDFile(mkurl(fp), 'r', disk_cache=cache)
+        assert xfile.read() == b'B' * 10
+        xfile.close()
+        with open(fp, 'wb') as f:
+            f.write(b'A' * 10)
+        cache.clear()
+
+
+def test_readinto(tmppath):
+    """Test readinto()."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+
+    for kwargs in [dict(), dict(buffer_size=16, readahead=2)]:
+        xfile = XRootDFile(mkurl(fp), 'r', **kwargs)
+        buf = bytearray(20)
+        assert xfile.readinto(buf) == 20
+        assert bytes(buf) == fc[:20]
+        assert xfile.tell() == 20
+
+        view = memoryview(buf)
+        assert xfile.readinto(view[5:15]) == 10
+        assert bytes(buf[5:15]) == fc[20:30]
+
+        buf = bytearray(len(fc))
+        assert xfile.readinto(buf) == len(fc) - 30
+        assert bytes(buf[:len(fc) - 30]) == fc[30:]
+        assert xfile.readinto(buf) == 0
+        assert xfile.readinto(bytearray()) == 0
+        xfile.close()
+
+    xfile = XRootDFile(mkurl(fp), 'r')
+    pytest.raises(TypeError, xfile.readinto, b'immutable')
+    xfile.close()
+    pytest.raises(ValueError, xfile.readinto, bytearray(10))
+
+    xfile = XRootDFile(mkurl(fp), 'w')
+    pytest.raises(IOError, xfile.readinto, bytearray(10))
+
+
+def test_readinto_numpy(tmppath):
+    """Test readinto() with NumPy arrays."""
+    np = pytest.importorskip('numpy')
+    fp = join(tmppath, 'data/multiline.txt')
+    with open(fp, 'rb') as f:
+        fc = f.read()
+
+    xfile = XRootDFile(mkurl(fp), 'rb', parallel_reads=2, range_size=8)
+    array = np.zeros((2, 3), dtype='>i4')
+    assert xfile.readinto(array) == 24
+    assert array.tobytes() == fc[:24]
+    records = np.zeros(2, dtype=[('a', '<u2'), ('b', 'S3')])
+    assert xfile.readinto(records) == 10
+    assert records.tobytes() == fc[24:34]
+    pytest.raises(TypeError, xfile.readinto, np.zeros((4, 4))[:, 0])
+
+
+def test_readv(tmppath, monkeypatch):
+    """Test readv()."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    xfile = XRootDFile(mkurl(fp), 'r')
+
+    chunks = [(0, 10), (100, 5), (3, 20), (140, 100), (200, 10), (7, 0)]
+    expected = [fc[o:o+n] for o, n in chunks]
+    assert xfile.readv(chunks) == expected
+    assert xfile.tell() == 0
+    assert xfile.readv([]) == []
+
+    # Requests exceeding the server limits are split.
+    monkeypatch.setattr(xrdfile, 'READV_MAX_CHUNKS', 2)
+    monkeypatch.setattr(xrdfile, 'READV_MAX_CHUNK_SIZE', 4)
+    xfile._file.vector_read = Mock(wraps=xfile._file.vector_read)
+    assert xfile.readv(chunks) == expected
+    assert xfile._file.vector_read.call_count == 6
+    xfile.close()
+
+    pytest.raises(ValueError, xfile.readv, chunks)
+    pytest.raises(IOError, XRootDFile(mkurl(fp), 'r-').readv, chunks)
+
+    # Mock an error
+    fake_status = {
+        "status": 3,
+        "code": 0,
+        "ok": False,
+        "errno": errno.EREMOTE,
+        "error": True,
+        "message": '[FATAL] Remote I/O Error',
+        "fatal": True,
+        "shellcode": 51
+    }
+    xfile = XRootDFile(mkurl(fp), 'r')
+    xfile._file.vector_read = Mock(
+        return_value=(XRootDStatus(fake_status), None))
+    pytest.raises(IOError, xfile.readv, chunks)
+
+
+def test_read_parallel(tmppath):
+    """Test large reads split in concurrent requests."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+
+    xfile = XRootDFile(mkurl(fp), 'r', parallel_reads=3, range_size=10)
+    xfile._file.read = Mock(wraps=xfile._file.read)
+    assert xfile.read() == fc
+    assert xfile._file.read.call_count == int(math.ceil(len(fc) / 10.0))
+    assert xfile.tell() == len(fc)
+
+    xfile.seek(4)
+    assert xfile.read(200) == fc[4:]
+    xfile.seek(4)
+    buf = bytearray(200)
+    assert xfile.readinto(buf) == len(fc) - 4
+    assert bytes(buf[:len(fc) - 4]) == fc[4:]
+    xfile.close()
+
+    # Small reads use a single request.
+    xfile = XRootDFile(mkurl(fp), 'r', parallel_reads=3, range_size=10)
+    xfile._file.read = Mock(wraps=xfile._file.read)
+    assert xfile.read(10) == fc[:10]
+    assert xfile._file.read.call_count == 1
+    xfile.close()
+
+    # Mock an error
+    fake_status = {
+        "status": 3,
+        "code": 0,
+        "ok": False,
+        "errno": errno.EREMOTE,
+        "error": True,
+        "message": '[FATAL] Remote I/O Error',
+        "fatal": True,
+        "shellcode": 51
+    }
+    xfile = XRootDFile(mkurl(fp), 'r', parallel_reads=3, range_size=10)
+    xfile._file.read = Mock(return_value=XRootDStatus(fake_status))
+    pytest.raises(IOError, xfile.read)
+
+
 def test_readline(tmppath):
     """Tests for readline()."""
     fd = get_mltl_file(tmppath)
@@ -993,6 +1436,215 @@ def test_readline(tmppath):
     assert xfile.readline() == u'\x00'+str2
 
 
+def test_async(tmppath):
+    """Test asynchronous requests."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+
+    future = XRootDFile.open_async(mkurl(fp), 'r+', readahead=2)
+    xfile = future.result()
+    assert isinstance(xfile, XRootDFile)
+    assert xfile._readahead is not None
+
+    futures = [xfile.read_async(i, 5) for i in range(0, 20, 5)]
+    assert [f.result() for f in futures] == \
+        [fc[i:i + 5] for i in range(0, 20, 5)]
+    assert xfile.tell() == 0
+
+    assert xfile.stat_async().result().size == len(fc)
+    assert xfile.size == len(fc)
+    xfile.write_async(b'abc', len(fc)).result()
+    assert xfile.size == len(fc) + 3
+    assert xfile.read() == fc + 'abc'
+    xfile.close()
+    pytest.raises(ValueError, xfile.read_async, 0, 1)
+
+    future = XRootDFile.open_async(mkurl(join(tmppath, 'data/nope')))
+    pytest.raises(ResourceNotFoundError, future.result)
+
+    xfile = XRootDFile(mkurl(fp), 'r')
+    pytest.raises(IOError, xfile.write_async, b'abc', 0)
+
+
+def test_lazy(tmppath):
+    """Test deferred opening and reuse of the status from the open."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+
+    xfile = XRootDFile(mkurl(fp), 'r', lazy=True)
+    xfile._file.open = Mock(wraps=xfile._file.open)
+    xfile._file.stat = Mock(wraps=xfile._file.stat)
+    assert not xfile.closed
+    assert xfile._file.open.call_count == 0
+    assert xfile.read(5) == fc[:5]
+    assert xfile.size == len(fc)
+    assert xfile.read() == fc[5:]
+    assert xfile._file.open.call_count == 1
+    xfile._file.stat.assert_called_once_with()
+    xfile.close()
+    assert xfile.closed
+
+    # Closing a file which was never opened sends no request.
+    xfile = XRootDFile(mkurl(join(tmppath, 'data/nope')), lazy=True)
+    xfile.close()
+    assert xfile.closed
+    xfile = XRootDFile(mkurl(fp), lazy=True)
+    xfile._file.open = Mock(side_effect=AssertionError)
+    future = xfile.close_async()
+    assert future.done()
+    assert future.result() is None
+    assert xfile.closed
+
+    xfile = XRootDFile(mkurl(join(tmppath, 'data/nope')), lazy=True)
+    pytest.raises(ResourceNotFoundError, xfile.read)
+
+    # Files opened for writing are opened immediately.
+    xfile = XRootDFile(mkurl(join(tmppath, 'data/new.txt')), 'w',
+                       lazy=True)
+    assert xfile._file.is_open()
+    xfile.write(b'abc')
+    assert xfile.size == 3
+    xfile.close()
+
+
+def test_checksum(tmppath, monkeypatch):
+    """Test checksums computed while reading and writing."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    md5 = hashlib.md5(fc).hexdigest()
+
+    xfile = XRootDFile(mkurl(fp), 'r', checksum='md5')
+    assert xfile.read(10) == fc[:10]
+    assert xfile.hexdigest() is None
+    xfile.seek(5)
+    xfile.read(10)
+    xfile.seek(0, SEEK_END)
+    assert xfile.read() == b''
+    xfile.seek(15)
+    xfile.read()
+    assert xfile.hexdigest() == md5
+    assert xfile.checksum is None
+    xfile.close()
+    assert xfile.checksum == ('md5', md5)
+
+    # Lines, concurrent reads into a buffer and read-ahead.
+    xfile = XRootDFile(mkurl(fp), 'r', checksum='md5', buffer_size=8)
+    assert list(xfile) == fc.splitlines(True)
+    assert xfile.hexdigest() == md5
+    xfile = XRootDFile(mkurl(fp), 'r', checksum='md5', parallel_reads=2,
+                       range_size=16)
+    assert xfile.readinto(bytearray(len(fc) + 10)) == len(fc)
+    assert xfile.hexdigest() == md5
+    xfile = XRootDFile(mkurl(fp), 'r', checksum='md5', buffer_size=16,
+                       readahead=2)
+    while xfile.read(16):
+        pass
+    assert xfile.hexdigest() == md5
+
+    # Skipped data.
+    xfile = XRootDFile(mkurl(fp), 'r', checksum='md5')
+    xfile.seek(10)
+    xfile.read()
+    xfile.close()
+    assert xfile.checksum is None
+
+    # Writing.
+    fp = join(tmppath, 'data/new.txt')
+    xfile = XRootDFile(mkurl(fp), 'w+', checksum='md5')
+    xfile.write(b'hello ')
+    xfile.write(b'world')
+    assert xfile.hexdigest() == hashlib.md5(b'hello world').hexdigest()
+    xfile.truncate(5)
+    assert xfile.hexdigest() is None
+    xfile = XRootDFile(mkurl(fp), 'w', checksum='md5')
+    xfile.write(b'hello ')
+    xfile.seek(0)
+    xfile.write(b'j')
+    assert xfile.hexdigest() is None
+
+    # Verification against the server checksum.
+    xfile = XRootDFile(mkurl(fp), 'w', checksum='adler32',
+                       verify_checksum=True)
+    xfile.write(b'hello')
+    pytest.raises(UnsupportedError, xfile.close)
+
+    fake_status = {
+        "status": 0,
+        "code": 0,
+        "ok": True,
+        "errno": 0,
+        "error": False,
+        "message": '[SUCCESS] ',
+        "fatal": False,
+        "shellcode": 0
+    }
+    adler32 = "{0:08x}".format(zlib.adler32(b'hello') & 0xffffffff)
+    for response, error in [('adler32 {0}\x00'.format(adler32), None),
+                            ('adler32 0000abcd\x00', IOError),
+                            ('md5 {0}'.format(md5), UnsupportedError)]:
+        server = Mock()
+        server.query.return_value = (XRootDStatus(fake_status), response)
+        monkeypatch.setattr(xrdfile, 'FileSystem', Mock(return_value=server))
+        xfile = XRootDFile(mkurl(fp), 'w', checksum='adler32',
+                           verify_checksum=True)
+        xfile.write(b'hello')
+        if error is None:
+            xfile.close()
+        else:
+            pytest.raises(error, xfile.close)
+        assert xfile.checksum == ('adler32', adler32)
+        assert xfile.closed
+
+    pytest.raises(UnsupportedError, XRootDFile, mkurl(fp), checksum='nope')
+
+
+def test_readline_buffer(tmppath):
+    """Test readline() buffer across seeks."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    lines = fc.splitlines(True)
+
+    xfile = XRootDFile(mkurl(fp), 'r')
+    xfile._file.read = Mock(wraps=xfile._file.read)
+    assert xfile.readline() == lines[0]
+    assert xfile.tell() == len(lines[0])
+    assert xfile.readline() == lines[1]
+
+    # Peek and seek back.
+    pos = xfile.tell()
+    assert xfile.read(5) == lines[2][:5]
+    xfile.seek(pos)
+    assert xfile.readline() == lines[2]
+    xfile.seek(xfile.tell() - 3)
+    assert xfile.readline() == lines[2][-3:]
+    xfile.seek(len(lines[0]) + 2)
+    assert xfile.readline() == lines[1][2:]
+    buf = bytearray(4)
+    assert xfile.readinto(buf) == 4
+    assert bytes(buf) == lines[2][:4]
+    assert xfile._file.read.call_count == 1
+    xfile.close()
+
+    # Lines spanning several chunks, with a small window.
+    xfile = XRootDFile(mkurl(fp), 'r', buffer_size=4)
+    assert xfile.readlines() == lines
+    xfile.seek(0)
+    assert xfile.readline() == lines[0]
+    assert xfile.read(3) == lines[1][:3]
+    assert xfile.readline() == lines[1][3:]
+    xfile.seek(2)
+    assert xfile.readline() == lines[0][2:]
+    assert xfile.readline() == lines[1]
+
+    # Writes discard the buffer.
+    xfile = XRootDFile(mkurl(fp), 'r+')
+    assert xfile.readline() == lines[0]
+    xfile.seek(0)
+    xfile.write('XX')
+    xfile.seek(0)
+    assert xfile.readline() == 'XX' + lines[0][2:]
+
+
 def test_flush(tmppath):
     """Tests for flush()"""
     # Mostly it just ensures calling it doesn't crash the program.
@@ -1090,6 +1742,96 @@ def test_xreadlines(tmppath):
     assert list(xl) == rl
 
 
+def test_iter_line_batches(tmppath):
+    """Test iter_line_batches()."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    lines = fc.splitlines(True)
+
+    xfile = XRootDFile(mkurl(fp), 'r')
+    batches = list(xfile.iter_line_batches(3))
+    assert [len(b) for b in batches[:-1]] == [3] * (len(batches) - 1)
+    assert sum(batches, []) == lines
+    assert xfile.tell() == len(fc)
+
+    xfile.seek(0)
+    batches = xfile.iter_line_batches(2)
+    assert next(batches) == lines[:2]
+    assert xfile.tell() == len(''.join(lines[:2]))
+    assert xfile.readline() == lines[2]
+    assert next(batches) == lines[3:5]
+    xfile.seek(0)
+    assert next(batches) == lines[:2]
+
+    # Small buffer sizes with lines spanning several chunks.
+    xfile = XRootDFile(mkurl(fp), 'r', buffer_size=5)
+    assert sum(xfile.iter_line_batches(4), []) == lines
+    xfile.close()
+    pytest.raises(ValueError, list, xfile.iter_line_batches(4))
+
+
+def test_iterator_lines(tmppath):
+    """Test iteration over lines mixed with other operations."""
+    fd = get_mltl_file(tmppath)
+    fp, fc = fd['full_path'], fd['contents']
+    lines = fc.splitlines(True)
+
+    xfile = XRootDFile(mkurl(fp), 'r')
+    assert list(xfile) == lines
+
+    xfile.seek(0)
+    it = iter(xfile)
+    assert next(it) == lines[0]
+    assert xfile.tell() == len(lines[0])
+    assert xfile.read(3) == lines[1][:3]
+    assert next(it) == lines[1][3:]
+    xfile.seek(0)
+    assert next(it) == lines[0]
+    assert list(it) == lines[1:]
+
+
+def test_textmode(tmppath):
+    """Test decoding and universal newlines in text mode."""
+    fp = join(tmppath, 'data/text.txt')
+    content = u'\xe6\xf8\xe5\r\nb\rc\n\r\nd'
+    with open(fp, 'wb') as f:
+        f.write(content.encode('utf-8'))
+
+    # Small chunks split both "\r\n" and multi-byte characters.
+    for buffer_size in [1, 2, 3, 64*1024]:
+        xfile = XRootDFile(mkurl(fp), 'rt', encoding='utf-8',
+                           buffer_size=buffer_size)
+        assert list(xfile) == [u'\xe6\xf8\xe5\n', u'b\n', u'c\n', u'\n', u'd']
+        assert isinstance(xfile.readline(), text_type)
+        xfile.seek(0)
+        assert xfile.read(4) == u'\xe6\xf8\xe5\n'
+        assert xfile.readline() == u'b\n'
+        assert xfile.read() == u'c\n\nd'
+        assert xfile.read() == u''
+
+    xfile = XRootDFile(mkurl(fp), 'rt', encoding='utf-8', newline='')
+    assert xfile.readlines() == [
+        u'\xe6\xf8\xe5\r\n', u'b\r', u'c\n', u'\r\n', u'd']
+    xfile.seek(0)
+    assert list(xfile.iter_line_batches(2)) == [
+        [u'\xe6\xf8\xe5\r\n', u'b\r'], [u'c\n', u'\r\n'], [u'd']]
+
+    xfile = XRootDFile(mkurl(fp), 'rt', encoding='utf-8', newline='\r\n')
+    assert list(xfile) == [u'\xe6\xf8\xe5\r\n', u'b\rc\n\r\n', u'd']
+
+    # Modifying the file resets the decoder.
+    xfile = XRootDFile(mkurl(fp), 'w+t', encoding='utf-8', newline='\r\n')
+    xfile.write(u'a\nb\n')
+    xfile.seek(0)
+    assert list(xfile) == [u'a\r\n', u'b\r\n']
+    xfile.truncate(1)
+    assert xfile.read() == u''
+    xfile.seek(0)
+    assert xfile.read() == u'a'
+
+    pytest.raises(ValueError, XRootDFile, mkurl(fp), 'rbt')
+
+
 def test_fileno(tmppath):
     """Test fileno."""
     pytest.raises(
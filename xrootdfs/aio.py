@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""asyncio interface (requires Python 3.6 or later).
+
+Requests are sent with the callback interface of the XRootD bindings (see
+:py:mod:`xrootdfs.futures`), and responses are handed over to the event loop
+from the XRootD client thread. No thread is blocked while a request is in
+flight, so the number of concurrent transfers is not limited by the size of
+a thread pool:
+
+.. code-block:: python
+
+    import asyncio
+    from xrootdfs.aio import AsyncXRootDFile
+
+    async def count_lines(url):
+        n = 0
+        async with await AsyncXRootDFile.open(url, 'rb') as f:
+            async for line in f:
+                n += 1
+        return n
+
+    asyncio.get_event_loop().run_until_complete(
+        count_lines("root://localhost//tmp/data.csv"))
+
+Namespace operations are available through :py:class:`AsyncXRootDFS`, e.g.
+to stat many files concurrently:
+
+.. code-block:: python
+
+    from xrootdfs.aio import AsyncXRootDFS
+
+    async def sizes(paths):
+        fs = AsyncXRootDFS("root://localhost//tmp/")
+        infos = await asyncio.gather(*[fs.getinfo(p) for p in paths])
+        return [info['size'] for info in infos]
+"""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+import fnmatch
+import functools
+import re
+
+from fs import SEEK_CUR, SEEK_END, SEEK_SET
+from fs.errors import DestinationExistsError, DirectoryNotEmptyError, \
+    FSError, ResourceInvalidError, ResourceNotFoundError, UnsupportedError
+from fs.path import normpath, pathcombine, pathjoin
+from six import b
+from six.moves.urllib.parse import parse_qs
+from XRootD.client.flags import AccessMode, DirListFlags, MkDirFlags, \
+    QueryCode
+
+from .fs import XRootDFS
+from .futures import XRootDFuture
+from .utils import byteview
+from .xrdfile import XRootDFile
+
+
+def wrap_future(future, loop=None):
+    """Wrap an :py:class:`xrootdfs.futures.XRootDFuture` for asyncio.
+
+    :param future: Future of an XRootD request.
+    :param loop: Event loop (defaults to the current event loop).
+    :returns: ``asyncio.Future`` completed in the event loop with the result
+        or exception of ``future``.
+    """
+    loop = loop or asyncio.get_event_loop()
+    afuture = loop.create_future()
+
+    def transfer(future):
+        if afuture.cancelled():
+            return
+        try:
+            afuture.set_result(future.result())
+        except Exception as e:
+            afuture.set_exception(e)
+
+    future.add_done_callback(
+        lambda future: loop.call_soon_threadsafe(transfer, future))
+    return afuture
+
+
+class AsyncXRootDFile(object):
+
+    """asyncio interface for working with files over XRootD protocol.
+
+    Wraps a :py:class:`xrootdfs.xrdfile.XRootDFile` opened in binary mode.
+    Reads bypass the read-ahead and block caches of the wrapped file; reads
+    larger than its ``range_size`` are split into up to ``parallel_reads``
+    concurrent requests. The file position is shared by all coroutines using
+    the file, so do not have several positional reads or writes pending at
+    the same time.
+
+    Use :py:meth:`open` to open a file.
+
+    :param xfile: Opened :py:class:`xrootdfs.xrdfile.XRootDFile`.
+    """
+
+    def __init__(self, xfile):
+        """Initialize asynchronous file."""
+        if xfile._text:
+            raise ValueError("Text mode is not supported.")
+        self._xfile = xfile
+
+    @classmethod
+    async def open(cls, path, mode='rb', **kwargs):
+        """Open a file.
+
+        Takes the same arguments as :py:class:`xrootdfs.xrdfile.XRootDFile`.
+        """
+        if 't' in mode:
+            raise ValueError("Text mode is not supported.")
+        xfile = await wrap_future(XRootDFile.open_async(path, mode, **kwargs))
+        return cls(xfile)
+
+    async def __aenter__(self):
+        """Enter asynchronous context manager."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Exit asynchronous context manager."""
+        await self.close()
+
+    def __aiter__(self):
+        """Get asynchronous iterator over lines."""
+        return self
+
+    async def __anext__(self):
+        """Get next line."""
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    async def read(self, size=-1):
+        """Read up to ``size`` bytes (until EOF if negative)."""
+        xfile = self._xfile
+        if xfile.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        offset = xfile.tell()
+        if size < 0:
+            size = max(await self._size() - offset, 0)
+        if size == 0:
+            return b("")
+
+        # Serve the beginning from the read buffer filled by readline().
+        start = offset - xfile._buffer_pos
+        data = b("")
+        if 0 <= start < len(xfile._buffer):
+            data = memoryview(xfile._buffer)[start:start + size].tobytes()
+        if len(data) < size:
+            data += await self._fetch(offset + len(data), size - len(data))
+
+        xfile._ipp = offset + len(data)
+        return data
+
+    async def readinto(self, buffer):
+        """Read into a pre-allocated, writable buffer.
+
+        Returns the number of bytes read (0 at EOF).
+        """
+        view = byteview(buffer)
+        data = await self.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    async def readline(self):
+        """Read one entire line (including the trailing newline)."""
+        xfile = self._xfile
+        if xfile.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        buf, newline = xfile._buffer, xfile._newline
+        start = xfile.tell() - xfile._buffer_pos
+        if not 0 <= start <= len(buf):
+            del buf[:]
+            xfile._buffer_pos, start = xfile.tell(), 0
+
+        indx = buf.find(newline, start)
+        while indx == -1:
+            data = await self._fetch(
+                xfile._buffer_pos + len(buf), xfile.buffer_size)
+            if not data:
+                break
+            if start > xfile.buffer_size:
+                drop = start - xfile.buffer_size
+                del buf[:drop]
+                xfile._buffer_pos += drop
+                start -= drop
+            searchpos = max(start, len(buf) - len(newline) + 1)
+            buf.extend(data)
+            indx = buf.find(newline, searchpos)
+
+        end = len(buf) if indx == -1 else indx + len(newline)
+        xfile._ipp = xfile._buffer_pos + end
+        return memoryview(buf)[start:end].tobytes()
+
+    async def readlines(self):
+        """Read all remaining lines."""
+        return [line async for line in self]
+
+    async def write(self, data):
+        """Write ``data`` and return the number of bytes written."""
+        xfile = self._xfile
+        if xfile.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        if 'a' in xfile.mode:
+            xfile._ipp = await self._size()
+        data = xfile._encode(data)
+        offset = xfile.tell()
+        await wrap_future(xfile.write_async(data, offset))
+        xfile._ipp = offset + len(data)
+        return len(data)
+
+    async def seek(self, offset, whence=SEEK_SET):
+        """Set the file position and return the new absolute position."""
+        xfile = self._xfile
+        if whence == SEEK_CUR:
+            offset += xfile.tell()
+        elif whence == SEEK_END:
+            offset += await self._size()
+        elif whence != SEEK_SET:
+            raise NotImplementedError(whence)
+        xfile.seek(offset, SEEK_SET)
+        return xfile.tell()
+
+    def tell(self):
+        """Get the file position."""
+        return self._xfile.tell()
+
+    async def stat(self):
+        """Get the XRootD ``StatInfo`` object of the file."""
+        return await wrap_future(self._xfile.stat_async())
+
+    async def flush(self):
+        """Flush write buffers."""
+        await wrap_future(self._xfile.flush_async())
+
+    async def close(self):
+        """Close the file."""
+        if not self._xfile.closed:
+            await wrap_future(self._xfile.close_async())
+
+    @property
+    def closed(self):
+        """Check if file is closed."""
+        return self._xfile.closed
+
+    @property
+    def mode(self):
+        """Get mode of the file."""
+        return self._xfile.mode
+
+    @property
+    def name(self):
+        """Get filename."""
+        return self._xfile.name
+
+    async def _size(self):
+        """Get file size, retrieving it from the server if unknown."""
+        xfile = self._xfile
+        if xfile._size == -1:
+            xfile._size = (await self.stat()).size
+        return xfile._size
+
+    async def _fetch(self, offset, size):
+        """Read ``size`` bytes at ``offset`` from the server."""
+        xfile = self._xfile
+        if not xfile._parallel(size):
+            return await wrap_future(xfile.read_async(offset, size))
+
+        limit = asyncio.Semaphore(xfile.parallel_reads)
+
+        async def fetch(start):
+            async with limit:
+                return await wrap_future(xfile.read_async(
+                    offset + start, min(xfile.range_size, size - start)))
+
+        parts = await asyncio.gather(
+            *[fetch(start) for start in range(0, size, xfile.range_size)])
+        return b("").join(parts)
+
+
+def _matcher(wildcard):
+    """Get function matching names against a wildcard or callable."""
+    if wildcard is None:
+        return lambda name: True
+    if callable(wildcard):
+        return wildcard
+    wildcard_re = re.compile(fnmatch.translate(wildcard))
+    return lambda name: bool(wildcard_re.match(name))
+
+
+class AsyncXRootDFS(object):
+
+    """asyncio interface for XRootD namespace operations.
+
+    Methods have the same arguments as those of
+    :py:class:`xrootdfs.fs.XRootDFS` and raise the same exceptions, but are
+    coroutines (or asynchronous generators).
+
+    :param url: Root URL (see :py:class:`xrootdfs.fs.XRootDFS`) or an
+        existing :py:class:`xrootdfs.fs.XRootDFS`.
+    :param query: Dictionary of key/values to append to the URL query string.
+    """
+
+    def __init__(self, url, query=None):
+        """Initialize asynchronous file system."""
+        self.fs = url if isinstance(url, XRootDFS) else \
+            XRootDFS(url, query=query)
+
+    def _request(self, path, method, *args, **kwargs):
+        """Send a request with errors mapped like ``XRootDFS``."""
+        return wrap_future(XRootDFuture(
+            errback=lambda status: self.fs._raise_status(path, status),
+        ).submit(method, *args, **kwargs))
+
+    async def _stat(self, path):
+        """Get ``StatInfo`` of a path or ``None`` if it does not exist."""
+        try:
+            return await self._request(
+                path, self.fs.xrd_client.stat, self.fs._p(path))
+        except ResourceNotFoundError:
+            return None
+
+    async def open(self, path, mode='rb', **kwargs):
+        """Open a file.
+
+        :rtype: :py:class:`AsyncXRootDFile`
+        """
+        return await AsyncXRootDFile.open(
+            self.fs.getpathurl(path, with_querystring=True), mode, **kwargs)
+
+    async def exists(self, path):
+        """Check if a path references a valid resource."""
+        try:
+            await self._request(
+                path, self.fs.xrd_client.stat, self.fs._p(path))
+        except FSError:
+            return False
+        return True
+
+    async def isdir(self, path):
+        """Check if a path references a directory."""
+        stat = await self._stat(path)
+        return stat is not None and self.fs.isdir(path, _statobj=stat)
+
+    async def isfile(self, path):
+        """Check if a path references a file."""
+        stat = await self._stat(path)
+        return stat is not None and self.fs.isfile(path, _statobj=stat)
+
+    async def getinfo(self, path):
+        """Get information for a path as a dictionary.
+
+        See :py:meth:`xrootdfs.fs.XRootDFS.getinfo`. The stat and extended
+        attributes are requested concurrently.
+        """
+        fs = self.fs
+        fullpath = fs._p(path)
+        stat = self._request(path, fs.xrd_client.stat, fullpath)
+        xattr = wrap_future(XRootDFuture(
+            errback=fs._raise_query_status,
+        ).submit(fs.xrd_client.query, QueryCode.XATTR, fullpath))
+        try:
+            stat = await stat
+        except Exception:
+            xattr.cancel()
+            raise
+        return fs._info(stat, parse_qs(await xattr))
+
+    async def listdir(self, path="./", wildcard=None, full=False,
+                      absolute=False, dirs_only=False, files_only=False):
+        """List the files and directories under a given path."""
+        fs = self.fs
+        flag = DirListFlags.STAT if dirs_only or files_only else \
+            DirListFlags.NONE
+        entries = await self._request(
+            path, fs.xrd_client.dirlist, fs._p(path), flag)
+        return list(fs._ilistdir_helper(
+            path, entries, wildcard=wildcard, full=full, absolute=absolute,
+            dirs_only=dirs_only, files_only=files_only))
+
+    async def ilistdir(self, path="./", wildcard=None, full=False,
+                       absolute=False, dirs_only=False, files_only=False):
+        """Asynchronous generator of the files and directories in a path."""
+        for name in await self.listdir(
+                path, wildcard=wildcard, full=full, absolute=absolute,
+                dirs_only=dirs_only, files_only=files_only):
+            yield name
+
+    async def walk(self, path="/", wildcard=None, dir_wildcard=None,
+                   search="breadth", ignore_errors=False):
+        """Walk a directory tree, yielding ``(path, filenames)`` tuples.
+
+        See :py:meth:`fs.base.FS.walk`. Each directory is listed in a single
+        request, and with ``search="breadth"`` all directories of a level of
+        the tree are listed concurrently.
+        """
+        path = normpath(path)
+        wildcard, dir_wildcard = _matcher(wildcard), _matcher(dir_wildcard)
+        scan = functools.partial(
+            self._scan, wildcard=wildcard, dir_wildcard=dir_wildcard,
+            ignore_errors=ignore_errors)
+
+        if search == "breadth":
+            level = [(path, await scan(path, root=True))]
+            while level:
+                scans = await asyncio.gather(
+                    *[scan(d) for dummy, (dummy, dirs) in level
+                      for d in dirs])
+                paths = [d for dummy, (dummy, dirs) in level for d in dirs]
+                for dirpath, (filenames, dummy) in level:
+                    yield dirpath, filenames
+                level = list(zip(paths, scans))
+        elif search == "depth":
+            async for item in self._walk_depth(path, scan, True):
+                yield item
+        else:
+            raise ValueError("Search should be 'breadth' or 'depth'")
+
+    async def _walk_depth(self, path, scan, root=False):
+        """Walk a directory tree yielding the deepest paths first."""
+        filenames, dirs = await scan(path, root=root)
+        for d in dirs:
+            async for item in self._walk_depth(d, scan):
+                yield item
+        yield path, filenames
+
+    async def _scan(self, path, wildcard, dir_wildcard, ignore_errors,
+                    root=False):
+        """List a directory and return ``(filenames, dirpaths)``."""
+        fs = self.fs
+        try:
+            entries = await self._request(
+                path, fs.xrd_client.dirlist, fs._p(path), DirListFlags.STAT)
+        except ResourceNotFoundError:
+            if root:
+                raise
+            # Removed while walking.
+            return [], []
+        except FSError:
+            if ignore_errors:
+                return [], []
+            raise
+
+        filenames, dirs = [], []
+        for entry in entries:
+            if fs.isdir(entry.name, _statobj=entry.statinfo):
+                dirpath = pathcombine(path, entry.name)
+                if dir_wildcard(dirpath):
+                    dirs.append(dirpath)
+            elif wildcard(entry.name):
+                filenames.append(entry.name)
+        return filenames, dirs
+
+    async def makedir(self, path, recursive=False, allow_recreate=False):
+        """Make a directory."""
+        flags = MkDirFlags.MAKEPATH if recursive else MkDirFlags.NONE
+        try:
+            await self._request(
+                path, self.fs.xrd_client.mkdir, self.fs._p(path),
+                flags=flags, mode=AccessMode.NONE)
+        except DestinationExistsError:
+            if not allow_recreate:
+                raise
+        return True
+
+    async def remove(self, path):
+        """Remove a file."""
+        await self._request(path, self.fs.xrd_client.rm, self.fs._p(path))
+        return True
+
+    async def removedir(self, path, recursive=False, force=False):
+        """Remove a directory.
+
+        With ``force``, the contents of each directory are removed
+        concurrently.
+        """
+        if recursive:
+            raise UnsupportedError("recursive parameter is not supported.")
+
+        try:
+            await self._request(
+                path, self.fs.xrd_client.rmdir, self.fs._p(path))
+        except DirectoryNotEmptyError:
+            if not force:
+                raise
+            await self._removetree(path)
+        return True
+
+    async def _removetree(self, path):
+        """Remove a directory and its contents."""
+        fs = self.fs
+        entries = await self._request(
+            path, fs.xrd_client.dirlist, fs._p(path), DirListFlags.STAT)
+        await asyncio.gather(*[
+            self._removetree(pathjoin(path, entry.name))
+            if fs.isdir(entry.name, _statobj=entry.statinfo)
+            else self.remove(pathjoin(path, entry.name))
+            for entry in entries
+        ])
+        await self._request(path, fs.xrd_client.rmdir, fs._p(path))
+
+    async def move(self, src, dst, overwrite=False):
+        """Move a file from one location to another."""
+        stat = await self._stat(src)
+        if stat is None:
+            raise ResourceNotFoundError(src)
+        if not self.fs.isfile(src, _statobj=stat):
+            raise ResourceInvalidError(
+                src, msg="Source is not a file: %(path)s")
+
+        if overwrite:
+            stat = await self._stat(dst)
+            if stat is not None:
+                if self.fs.isdir(dst, _statobj=stat):
+                    await self.removedir(dst, force=True)
+                else:
+                    await self.remove(dst)
+
+        await self._request(
+            dst, self.fs.xrd_client.mv, self.fs._p(src), self.fs._p(dst))
+        return True
+
+    async def copy(self, src, dst, overwrite=False):
+        """Copy a file from source to destination.
+
+        The XRootD bindings have no asynchronous copy, so the (server-side)
+        copy is run in the default executor of the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.fs.copy, src, dst, overwrite))
+
+    async def xrd_checksum(self, path):
+        """Get checksum of file from server.
+
+        See :py:meth:`xrootdfs.fs.XRootDFS.xrd_checksum`.
+        """
+        stat = await self._stat(path)
+        if stat is None or not self.fs.isfile(path, _statobj=stat):
+            raise ResourceInvalidError("Path is not a file: %s" % path)
+        return await wrap_future(self.fs.xrd_checksum_async(path))
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Block caches for files read over XRootD.
+
+Files which are opened many times in the same process (e.g. calibration
+files) are otherwise re-read over the network on every open. A
+:py:class:`BlockCache` keeps recently read blocks in memory and evicts the
+least recently used blocks once its byte budget is exceeded.
+
+A :py:class:`DiskCache` stores blocks in sparse files on local disk, and thus
+survives process restarts. Cached blocks are only used as long as the size
+and modification time (or the checksum) of the remote file are unchanged.
+
+Enable a process-wide cache used by all files opened for reading only:
+
+.. code-block:: python
+
+    from xrootdfs.cache import BlockCache, get_block_cache, set_block_cache
+
+    set_block_cache(BlockCache(max_bytes=256*1024*1024))
+    # ... open and read files ...
+    get_block_cache().stats()
+
+Similarly, enable a node-local disk cache:
+
+.. code-block:: python
+
+    from xrootdfs.cache import DiskCache, set_disk_cache
+
+    set_disk_cache(DiskCache("/scratch/xrootdfs-cache", max_bytes=10*1024**3))
+"""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from os.path import exists, getmtime, join
+
+#: Number of blocks stored in a disk cache entry before its index is saved.
+INDEX_SAVE_INTERVAL = 64
+
+
+class BlockCache(object):
+
+    """Thread-safe LRU cache of file blocks with a byte budget.
+
+    Blocks are keyed by ``(root URL, path, block index)``. Files check the
+    version of the remote file against the cached blocks with
+    :py:meth:`validate` when they are opened.
+
+    :param max_bytes: Maximum number of bytes to keep in the cache (defaults
+        to 64MB).
+    :param block_size: Size in bytes of each cached block (defaults to 1MB).
+    """
+
+    def __init__(self, max_bytes=64*1024*1024, block_size=1024*1024):
+        """Initialize cache."""
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._blocks = OrderedDict()
+        self._paths = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Get block for ``key`` or ``None`` if it is not cached."""
+        with self._lock:
+            data = self._blocks.pop(key, None)
+            if data is None:
+                self.misses += 1
+                return None
+            # Re-insert to mark block as most recently used.
+            self._blocks[key] = data
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Store block ``data`` for ``key``."""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._blocks[key] = data
+            self._paths.setdefault(key[:2], set()).add(key[2])
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._blocks)))
+                self.evictions += 1
+
+    def validate(self, root_url, path, version):
+        """Remove the cached blocks of a file if it has been modified.
+
+        :param version: Value identifying the current version of the remote
+            file, e.g. ``(size, mtime)``.
+        """
+        key = (root_url, path)
+        with self._lock:
+            if self._versions.get(key, version) != version:
+                for idx in list(self._paths.get(key, ())):
+                    self._discard(key + (idx, ))
+            self._versions[key] = version
+
+    def invalidate(self, root_url, path):
+        """Remove all cached blocks of a file."""
+        with self._lock:
+            for idx in list(self._paths.get((root_url, path), ())):
+                self._discard((root_url, path, idx))
+
+    def clear(self):
+        """Remove all blocks from the cache."""
+        with self._lock:
+            self._blocks.clear()
+            self._paths.clear()
+            self._versions.clear()
+            self._size = 0
+
+    def stats(self):
+        """Get cache statistics.
+
+        The returned dictionary contains the keys ``hits``, ``misses``,
+        ``evictions``, ``blocks`` (number of cached blocks), ``bytes``
+        (number of cached bytes) and ``max_bytes``.
+        """
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                blocks=len(self._blocks),
+                bytes=self._size,
+                max_bytes=self.max_bytes,
+            )
+
+    def _discard(self, key):
+        """Remove a block if present (lock must be held)."""
+        data = self._blocks.pop(key, None)
+        if data is not None:
+            self._size -= len(data)
+            indexes = self._paths[key[:2]]
+            indexes.discard(key[2])
+            if not indexes:
+                del self._paths[key[:2]]
+                self._versions.pop(key[:2], None)
+
+
+class DiskCache(object):
+
+    """Persistent cache of file blocks on local disk.
+
+    Each remote file is stored in a sparse local data file, next to a small
+    JSON index which records the cached blocks and the version of the remote
+    file they belong to. Entries whose version no longer matches the remote
+    file are discarded.
+
+    :param directory: Directory in which to store the cache (created if it
+        does not exist).
+    :param block_size: Size in bytes of each cached block (defaults to 1MB).
+    :param max_bytes: Maximum number of bytes to keep in the cache. Least
+        recently opened files are removed when a new file is opened and the
+        limit is exceeded (defaults to ``None``, i.e. no limit). The size of
+        the cache is scanned once and then tracked in memory, so files
+        cached by other processes are only accounted for once the limit is
+        exceeded.
+    :param validate: How to detect that a remote file has changed. Either
+        ``stat`` (compare size and modification time) or ``checksum``
+        (compare the server-side checksum, falling back to ``stat`` if the
+        server does not support checksums).
+    """
+
+    def __init__(self, directory, block_size=1024*1024, max_bytes=None,
+                 validate='stat'):
+        """Initialize cache."""
+        if validate not in ['stat', 'checksum']:
+            raise ValueError("Invalid validation method {0}".format(validate))
+        if not exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.block_size = block_size
+        self.max_bytes = max_bytes
+        self.validate = validate
+        self._lock = threading.Lock()
+        self._usage = None
+        self._total = 0
+
+    def entry(self, root_url, path, version):
+        """Get the cache entry of a remote file.
+
+        :param root_url: Root URL of the server.
+        :param path: Path of the file on the server.
+        :param version: JSON serializable value identifying the current
+            version of the remote file, e.g. ``[size, mtime]``.
+        :rtype: :py:class:`DiskCacheEntry`
+        """
+        entry = DiskCacheEntry(
+            self._basepath(root_url, path), root_url + path, version,
+            self.block_size, cache=self)
+        if self.max_bytes is not None:
+            if self._usage is None:
+                self._scan()
+            self._record(entry.basepath, entry.nbytes, used=time.time())
+            if self._total > self.max_bytes:
+                self.prune(self.max_bytes, keep=entry.basepath)
+        return entry
+
+    def invalidate(self, root_url, path):
+        """Remove the cached blocks of a file (e.g. after modifying it)."""
+        basepath = self._basepath(root_url, path)
+        DiskCacheEntry.remove(basepath)
+        self._record(basepath, 0)
+
+    def _basepath(self, root_url, path):
+        """Get base path of the local files of a cached file."""
+        name = hashlib.sha1(
+            "{0}{1}".format(root_url, path).encode('utf-8')).hexdigest()
+        return join(self.directory, name)
+
+    def _scan(self):
+        """Get ``(last used, base path, bytes)`` of all cached files.
+
+        Also resets the tracked size of the cache.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.index'):
+                continue
+            basepath = join(self.directory, filename[:-len('.index')])
+            index = DiskCacheEntry.load_index(basepath)
+            if index is None:
+                continue
+            entries.append((
+                getmtime(basepath + '.index'),
+                basepath,
+                sum(index['blocks'].values()),
+            ))
+        with self._lock:
+            self._usage = dict((e[1], [e[0], e[2]]) for e in entries)
+            self._total = sum(e[2] for e in entries)
+        return entries
+
+    def _record(self, basepath, nbytes, used=None):
+        """Update the tracked size (and last use) of a cached file."""
+        with self._lock:
+            if self._usage is None:
+                return
+            old = self._usage.get(basepath, [used or time.time(), 0])
+            self._total += nbytes - old[1]
+            self._usage[basepath] = [used or old[0], nbytes]
+
+    def prune(self, max_bytes, keep=None):
+        """Remove least recently opened files until below ``max_bytes``.
+
+        :param keep: Base path of an entry which should not be removed.
+        """
+        entries = self._scan()
+        total = self._total
+        for dummy, basepath, nbytes in sorted(entries):
+            if total <= max_bytes:
+                break
+            if basepath != keep:
+                DiskCacheEntry.remove(basepath)
+                self._record(basepath, 0)
+                total -= nbytes
+
+    def clear(self):
+        """Remove all files from the cache."""
+        self.prune(0)
+
+
+class DiskCacheEntry(object):
+
+    """Cached blocks of a single remote file.
+
+    :param basepath: Path of the local files without extension.
+    :param url: URL of the remote file.
+    :param version: Version of the remote file.
+    :param block_size: Size in bytes of each block.
+    :param cache: :py:class:`DiskCache` tracking the size of the entry.
+    """
+
+    def __init__(self, basepath, url, version, block_size, cache=None):
+        """Initialize entry, discarding blocks of other versions."""
+        self.basepath = basepath
+        self.url = url
+        self.version = version
+        self.block_size = block_size
+        self.blocks = {}
+        self._cache = cache
+        self._unsaved = 0
+
+        index = self.load_index(basepath)
+        if index is not None and self._matches(index):
+            self.blocks = self._blocks(index)
+            # Mark entry as recently used.
+            os.utime(basepath + '.index', None)
+        elif index is not None or exists(basepath + '.data'):
+            self.remove(basepath)
+
+    def get(self, idx):
+        """Get block ``idx`` or ``None`` if it is not cached."""
+        length = self.blocks.get(idx)
+        if length is None:
+            return None
+        try:
+            with open(self.basepath + '.data', 'rb') as fp:
+                fp.seek(idx * self.block_size)
+                data = fp.read(length)
+        except IOError:
+            data = b''
+        if len(data) != length:
+            # Data file was removed or truncated by another process.
+            self.blocks.clear()
+            return None
+        return data
+
+    @property
+    def nbytes(self):
+        """Get the number of cached bytes."""
+        return sum(self.blocks.values())
+
+    def put(self, idx, data):
+        """Store block ``idx``.
+
+        The index is saved every :py:data:`INDEX_SAVE_INTERVAL` blocks and
+        on :py:meth:`flush`.
+        """
+        datapath = self.basepath + '.data'
+        fd = os.open(datapath, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as fp:
+            fp.seek(idx * self.block_size)
+            fp.write(data)
+        self.blocks[idx] = len(data)
+        self._unsaved += 1
+        if self._unsaved >= INDEX_SAVE_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Save the blocks stored since the last save to the index."""
+        if not self._unsaved:
+            return
+        # Merge with blocks stored by other processes in the meantime.
+        index = self.load_index(self.basepath)
+        if index is not None and self._matches(index):
+            for i, length in self._blocks(index).items():
+                self.blocks.setdefault(i, length)
+        self._save_index()
+        self._unsaved = 0
+        if self._cache is not None:
+            self._cache._record(self.basepath, self.nbytes)
+
+    def _matches(self, index):
+        """Check if index belongs to this version of the file."""
+        return index.get('url') == self.url and \
+            index.get('version') == self.version and \
+            index.get('block_size') == self.block_size
+
+    @staticmethod
+    def _blocks(index):
+        """Get blocks dictionary with integer keys from an index."""
+        return dict((int(k), v) for k, v in index['blocks'].items())
+
+    def _save_index(self):
+        """Atomically write the index file."""
+        fd, tmppath = tempfile.mkstemp(
+            dir=os.path.dirname(self.basepath), suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(dict(
+                url=self.url,
+                version=self.version,
+                block_size=self.block_size,
+                blocks=dict((str(k), v) for k, v in self.blocks.items()),
+            ), fp)
+        os.rename(tmppath, self.basepath + '.index')
+
+    @staticmethod
+    def load_index(basepath):
+        """Load the index of an entry (``None`` if missing or corrupt)."""
+        try:
+            with open(basepath + '.index') as fp:
+                return json.load(fp)
+        except (IOError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def remove(basepath):
+        """Remove the files of an entry."""
+        for ext in ['.index', '.data']:
+            try:
+                os.remove(basepath + ext)
+            except OSError:
+                pass
+
+
+_block_cache = None
+_disk_cache = None
+
+
+def set_block_cache(cache):
+    """Set the process-wide block cache.
+
+    The cache is used by all files subsequently opened for reading only,
+    unless they are opened with ``block_cache=False``. Pass ``None`` to
+    disable the process-wide cache.
+
+    :param cache: A :py:class:`BlockCache` or ``None``.
+    """
+    global _block_cache
+    _block_cache = cache
+
+
+def get_block_cache():
+    """Get the process-wide block cache (``None`` if not enabled)."""
+    return _block_cache
+
+
+def set_disk_cache(cache):
+    """Set the process-wide disk cache.
+
+    The cache is used by all files subsequently opened for reading only,
+    unless they are opened with ``disk_cache=False``. Pass ``None`` to
+    disable the process-wide cache.
+
+    :param cache: A :py:class:`DiskCache` or ``None``.
+    """
+    global _disk_cache
+    _disk_cache = cache
+
+
+def get_disk_cache():
+    """Get the process-wide disk cache (``None`` if not enabled)."""
+    return _disk_cache
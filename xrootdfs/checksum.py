@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Client-side checksums.
+
+Not all XRootD servers can calculate checksums. Files can instead compute a
+checksum of the data as it is read or written (see the ``checksum`` argument
+of :py:class:`xrootdfs.xrdfile.XRootDFile`), without a second pass over the
+file:
+
+.. code-block:: python
+
+    from xrootdfs import XRootDFile
+
+    f = XRootDFile("root://localhost//tmp/data.bin", "wb",
+                   checksum="adler32")
+    for chunk in chunks:
+        f.write(chunk)
+    f.close()
+    f.checksum  # e.g. ("adler32", "0a3f01c2")
+
+Checksums are formatted like those returned by the server, i.e. ``adler32``,
+``crc32`` and ``crc32c`` as 8 hexadecimal digits. Besides these, all
+algorithms of :py:mod:`hashlib` (e.g. ``md5`` and ``sha256``) are supported.
+``crc32c`` requires the `crc32c <https://pypi.python.org/pypi/crc32c>`_
+package (``pip install xrootdfs[crc32c]``).
+"""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import zlib
+
+from fs.errors import UnsupportedError
+from six import PY2
+
+
+class Checksum(object):
+
+    """Incremental checksum with a ``hashlib``-like interface.
+
+    :param algorithm: Name of the algorithm (e.g. ``adler32``, ``crc32c``,
+        ``md5`` or ``sha256``).
+    :raise `fs.errors.UnsupportedError`: If the algorithm is not supported.
+    """
+
+    def __init__(self, algorithm):
+        """Initialize checksum."""
+        self.algorithm = algorithm
+        self._value = None
+        self._hash = None
+        if algorithm == 'adler32':
+            self._update, self._value = zlib.adler32, 1
+        elif algorithm == 'crc32':
+            self._update, self._value = zlib.crc32, 0
+        elif algorithm == 'crc32c':
+            try:
+                from crc32c import crc32c
+            except ImportError:
+                raise UnsupportedError(
+                    opname="calculate crc32c checksum",
+                    msg="The crc32c package is required to %(opname)s.")
+            self._update, self._value = crc32c, 0
+        else:
+            try:
+                self._hash = hashlib.new(algorithm)
+            except ValueError:
+                raise UnsupportedError(
+                    opname="calculate {0} checksum".format(algorithm))
+
+    def update(self, data):
+        """Update the checksum with a bytes-like object."""
+        if PY2 and isinstance(data, (bytearray, memoryview)):
+            # Python 2 zlib only accepts read-only buffers.
+            data = memoryview(data).tobytes()
+        if self._hash is not None:
+            self._hash.update(data)
+        else:
+            self._value = self._update(data, self._value)
+
+    def hexdigest(self):
+        """Get the checksum of the data so far as a hexadecimal string."""
+        if self._hash is not None:
+            return self._hash.hexdigest()
+        return "{0:08x}".format(self._value & 0xffffffff)
+
+
+def parse_checksum(value):
+    """Parse checksum query response into ``(algorithm, value)``."""
+    algorithm, value = value.strip().split(" ")
+    if value[-1] == "\x00":
+        value = value[:-1]
+    return (algorithm, value)
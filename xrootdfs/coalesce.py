@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Coalescing of small reads into few requests.
+
+Readers parsing a file field by field issue many small reads at nearby
+offsets, each costing a round trip. A :py:class:`ReadCoalescer` instead
+collects reads for a short time, merges overlapping, adjacent or nearby
+ranges, and sends them in a single (vector) read request:
+
+.. code-block:: python
+
+    from xrootdfs import XRootDFile
+
+    f = XRootDFile("root://localhost//tmp/events.dat")
+    reads = f.coalescer(gap=1024)
+    futures = [reads.read(offset, 48) for offset in offsets]
+    headers = [future.result() for future in futures]
+
+Requesting a result sends the pending reads immediately, so a single thread
+issuing reads first and collecting results afterwards does not wait for the
+delay to elapse.
+"""
+
+from __future__ import absolute_import, print_function
+
+import functools
+import threading
+
+from six import b
+
+from .futures import XRootDFuture
+
+
+class CoalescedRead(XRootDFuture):
+
+    """Future of a read which may not have been sent yet.
+
+    Waiting for the result sends the pending reads of the coalescer.
+
+    :param coalescer: :py:class:`ReadCoalescer` collecting the read.
+    :param offset: Offset of the read.
+    :param size: Number of bytes to read.
+    :param errback: See :py:class:`xrootdfs.futures.XRootDFuture`.
+    """
+
+    def __init__(self, coalescer, offset, size, errback=None):
+        """Initialize future."""
+        super(CoalescedRead, self).__init__(errback=errback)
+        self.coalescer = coalescer
+        self.offset = offset
+        self.size = size
+
+    def wait(self, timeout=None):
+        """Send pending reads, then wait for the response."""
+        if not self.done():
+            self.coalescer.flush()
+        return super(CoalescedRead, self).wait(timeout)
+
+
+class ReadCoalescer(object):
+
+    """Collect small reads of a file and send them in few requests.
+
+    Reads are sent ``delay`` seconds after the first pending read, once
+    ``max_reads`` reads are pending, on :py:meth:`flush`, or when the result
+    of a pending read is requested. Ranges less than ``gap`` bytes apart are
+    merged (the bytes in between are read and discarded). A single merged
+    range is sent as a read request, several as vector read requests (see
+    :py:meth:`xrootdfs.xrdfile.XRootDFile.readv`). Reads bypass read
+    buffers and caches, and do not move the file pointer.
+
+    :param xfile: :py:class:`xrootdfs.xrdfile.XRootDFile` opened for reading.
+    :param gap: Maximum number of bytes between two ranges to merge them
+        (defaults to 4KB). Pass 0 to only merge overlapping and adjacent
+        ranges.
+    :param delay: Seconds to wait for further reads (defaults to 5ms). Pass
+        ``None`` to only send reads on :py:meth:`flush`, when ``max_reads``
+        reads are pending, or when a result is requested.
+    :param max_reads: Maximum number of pending reads (defaults to 1024).
+    """
+
+    def __init__(self, xfile, gap=4*1024, delay=0.005, max_reads=1024):
+        """Initialize coalescer."""
+        xfile._assert_mode("r")
+        self.gap = gap
+        self.delay = delay
+        self.max_reads = max_reads
+        self._file = xfile
+        self._lock = threading.Lock()
+        self._pending = []
+        self._filesize = None
+        self._timer = None
+        self.reads = 0
+        self.requests = 0
+
+    def read(self, offset, size):
+        """Read ``size`` bytes at ``offset``.
+
+        :returns: :py:class:`CoalescedRead` future of the data, which is
+            truncated at the end of the file.
+        """
+        xfile = self._file
+        if xfile.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        # Reads are sent directly, so send buffered writes first. The size
+        # is taken here, as the file may be in use when the timer sends.
+        xfile._flush_writes()
+        filesize = xfile.size
+        future = CoalescedRead(
+            self, offset, size,
+            errback=lambda statmsg: xfile._raise_status(
+                xfile.path, statmsg, "reading"),
+        )
+        with self._lock:
+            self._pending.append(future)
+            self._filesize = filesize
+            self.reads += 1
+            full = len(self._pending) >= self.max_reads
+            if not full and self._timer is None and self.delay is not None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return future
+
+    def flush(self):
+        """Send the pending reads."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            filesize = self._filesize
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if pending:
+            self._send(pending, filesize)
+
+    def _merge(self, reads):
+        """Merge reads into ``[start, end, reads]`` ranges sorted by offset."""
+        ranges = []
+        for read in sorted(reads, key=lambda read: read.offset):
+            end = read.offset + max(read.size, 0)
+            if ranges and read.offset <= ranges[-1][1] + self.gap:
+                ranges[-1][1] = max(ranges[-1][1], end)
+                ranges[-1][2].append(read)
+            else:
+                ranges.append([read.offset, end, [read]])
+        return ranges
+
+    def _send(self, reads, filesize):
+        """Send requests for the given reads.
+
+        Only uses the file handle, as it may run in the timer thread.
+        """
+        xfile = self._file
+        ranges = self._merge(reads)
+        batches = xfile._readv_batches(
+            [(start, end - start) for start, end, dummy in ranges], filesize)
+
+        if sum(len(batch) for batch in batches) <= 1:
+            # A single range needs no vector read. Ranges past the end of
+            # the file have no pieces, but still need a status.
+            batch = batches[0] if batches else [(0, ranges[0][0], 1)]
+            requests = [(
+                batch, xfile._file.read,
+                dict(offset=batch[0][1], size=batch[0][2]),
+                lambda response: [response],
+            )]
+        else:
+            requests = [(
+                batch, xfile._file.vector_read,
+                dict(chunks=[(offset, size) for dummy, offset, size in batch]),
+                lambda response: [chunk.buffer for chunk in response.chunks],
+            ) for batch in batches]
+
+        parts = [[] for dummy in ranges]
+        state = dict(remaining=len(requests), status=None)
+        lock = threading.Lock()
+
+        def completed(batch, buffers, future):
+            with lock:
+                if future.status.ok:
+                    for (i, offset, dummy), data in zip(
+                            batch, buffers(future.response)):
+                        parts[i].append((offset, data))
+                if state['status'] is None or state['status'].ok:
+                    state['status'] = future.status
+                state['remaining'] -= 1
+                done = not state['remaining']
+            if done:
+                self._resolve(ranges, parts, state['status'])
+
+        with self._lock:
+            self.requests += len(requests)
+        for batch, method, kwargs, buffers in requests:
+            future = XRootDFuture()
+            future.add_done_callback(
+                functools.partial(completed, batch, buffers))
+            future.submit(method, **kwargs)
+
+    def _resolve(self, ranges, parts, status):
+        """Complete the futures of the reads with the received data."""
+        for (start, dummy, reads), received in zip(ranges, parts):
+            data = b("").join(d for dummy, d in sorted(received))
+            for read in reads:
+                begin = read.offset - start
+                read(status, data[begin:begin + max(read.size, 0)]
+                     if status.ok else None, None)
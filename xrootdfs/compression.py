@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Streaming decompression of remote files.
+
+:py:func:`open_compressed` opens a gzip, bzip2 or xz compressed file and
+returns the standard :py:mod:`io` stack over the decompressed data:
+
+.. code-block:: python
+
+    from xrootdfs import XRootDFS
+
+    fs = XRootDFS("root://localhost//tmp/")
+    with fs.open("logs/app.log.gz", compression="auto") as f:
+        for line in f:
+            pass
+
+The compressed file is read in chunks of ``buffer_size`` bytes with
+read-ahead, so the next chunks are transferred by the XRootD client threads
+while the current chunk is decompressed (:py:mod:`zlib`, :py:mod:`bz2` and
+:py:mod:`lzma` release the GIL while decompressing). Concatenated streams,
+e.g. of ``cat a.gz b.gz``, are decompressed as one stream.
+"""
+
+from __future__ import absolute_import, print_function
+
+import bz2
+import io
+import zlib
+
+from fs.errors import UnsupportedError
+
+from .rawio import wrap_raw
+from .utils import byteview
+from .xrdfile import XRootDFile
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+#: Magic numbers of the supported formats.
+MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+]
+
+
+def decompressor(compression):
+    """Get a decompressor object for a compression format.
+
+    :param compression: ``gzip``, ``bz2`` or ``xz``.
+    :raise `fs.errors.UnsupportedError`: If the format is not supported.
+    """
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if compression == 'bz2':
+        return bz2.BZ2Decompressor()
+    if compression == 'xz':
+        if lzma is None:
+            raise UnsupportedError(
+                opname="decompress xz files",
+                msg="The backports.lzma package is required to %(opname)s "
+                    "on Python 2.")
+        return lzma.LZMADecompressor()
+    raise UnsupportedError(
+        opname="decompress {0} files".format(compression))
+
+
+class DecompressedRawIO(io.RawIOBase):
+
+    """Unbuffered reader of the decompressed data of a remote file.
+
+    :param path: URL of the file.
+    :type path: string
+    :param compression: ``gzip``, ``bz2``, ``xz``, or ``auto`` to detect the
+        format from the start of the file. With ``auto``, files in no
+        supported format are read as is.
+    :param kwargs: Further arguments passed to
+        :py:class:`xrootdfs.xrdfile.XRootDFile` (e.g. ``buffer_size`` and
+        ``readahead``, which default to 1MB and 4).
+    """
+
+    def __init__(self, path, compression='auto', **kwargs):
+        """Initialize raw file."""
+        super(DecompressedRawIO, self).__init__()
+        if compression != 'auto':
+            decompressor(compression)
+        kwargs.setdefault('buffer_size', 1024*1024)
+        kwargs.setdefault('readahead', 4)
+        self.compression = compression
+        self._file = XRootDFile(path, mode='rb-', **kwargs)
+        self._decompressor = None
+        self._pending = b''
+        self._pending_pos = 0
+        self._unused = b''
+        self._eof = False
+
+    def readinto(self, b):
+        """Read up to ``len(b)`` decompressed bytes into ``b`` (0 at EOF)."""
+        self._checkClosed()
+        view = byteview(b)
+        while self._pending_pos == len(self._pending) and not self._eof:
+            self._pending, self._pending_pos = self._decompress(), 0
+
+        start = self._pending_pos
+        n = min(len(view), len(self._pending) - start)
+        view[:n] = self._pending[start:start + n]
+        self._pending_pos += n
+        return n
+
+    def _decompress(self):
+        """Decompress the next chunk of the file."""
+        data = self._unused or self._file.read(self._file.buffer_size)
+        self._unused = b''
+        if not data:
+            self._eof = True
+            if not getattr(self._decompressor, 'eof', True):
+                raise EOFError("Compressed file ended before the "
+                               "end-of-stream marker was reached")
+            return b''
+
+        if self._decompressor is None:
+            if self.compression == 'auto':
+                for magic, compression in MAGIC:
+                    if data.startswith(magic):
+                        self.compression = compression
+                        break
+                else:
+                    self.compression = None
+            if self.compression is not None:
+                self._decompressor = decompressor(self.compression)
+        if self.compression is None:
+            return data
+
+        if getattr(self._decompressor, 'eof', False):
+            # Another stream starts at the beginning of the chunk.
+            self._decompressor = decompressor(self.compression)
+        out = self._decompressor.decompress(data)
+        if self._decompressor.unused_data:
+            # Another stream follows the end of the current stream.
+            self._unused = self._decompressor.unused_data
+            self._decompressor = decompressor(self.compression)
+        return out
+
+    def close(self):
+        """Close the file."""
+        if not self.closed:
+            try:
+                super(DecompressedRawIO, self).close()
+            finally:
+                self._file.close()
+
+    def readable(self):
+        """Check if file is readable."""
+        return True
+
+    @property
+    def name(self):
+        """Get URL of the file."""
+        return self._file.path
+
+    @property
+    def mode(self):
+        """Get mode of the file."""
+        return 'rb'
+
+    @property
+    def buffer_size(self):
+        """Get the preferred size of reads (used as default buffer size)."""
+        return self._file.buffer_size
+
+
+def open_compressed(path, mode='r', buffering=-1, encoding=None,
+                    errors=None, newline=None, line_buffering=False,
+                    compression='auto', **kwargs):
+    """Open a compressed file over XRootD for reading.
+
+    Arguments have the same meaning as for :py:func:`io.open`, and the
+    returned object is an :py:class:`io.BufferedReader` (binary mode) or an
+    :py:class:`io.TextIOWrapper` (text mode, i.e. unless ``b`` is in the
+    mode) over a :py:class:`DecompressedRawIO`.
+
+    :param path: URL of the file.
+    :type path: string
+    :param compression: ``gzip``, ``bz2``, ``xz`` or ``auto`` (see
+        :py:class:`DecompressedRawIO`).
+    :param kwargs: Further arguments passed to
+        :py:class:`xrootdfs.xrdfile.XRootDFile`.
+    :raise `fs.errors.UnsupportedError`: If the file is opened for writing
+        or the format is not supported.
+    """
+    if set(mode) & set('wa+'):
+        raise UnsupportedError(
+            opname="write compressed files",
+            msg="Unable to %(opname)s: only reading is supported.")
+    return wrap_raw(
+        DecompressedRawIO(path, compression=compression, **kwargs), mode,
+        buffering=buffering, encoding=encoding, errors=errors,
+        newline=newline, line_buffering=line_buffering)
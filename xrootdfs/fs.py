@@ -21,21 +21,27 @@ the entire PyFilesystem
 from __future__ import absolute_import, print_function
 
 import re
+import time
 from datetime import datetime
+from functools import partial
 from glob import fnmatch
-from urllib import urlencode
-from urlparse import parse_qs
 
 from fs.base import FS
 from fs.errors import DestinationExistsError, DirectoryNotEmptyError, \
     FSError, InvalidPathError, RemoteConnectionError, ResourceError, \
     ResourceInvalidError, ResourceNotFoundError, UnsupportedError
 from fs.path import dirname, frombase, normpath, pathcombine, pathjoin
-from six import binary_type
+from six import PY2, b, binary_type
+from six.moves.urllib.parse import parse_qs, urlencode
 from XRootD.client import CopyProcess, FileSystem
 from XRootD.client.flags import AccessMode, DirListFlags, MkDirFlags, \
     QueryCode, StatInfoFlags
 
+from .checksum import parse_checksum
+from .compression import open_compressed
+from .futures import XRootDFuture
+from .pagemap import PagedView
+from .rawio import open_io
 from .utils import is_valid_path, is_valid_url, spliturl
 from .xrdfile import XRootDFile
 
@@ -101,10 +107,8 @@ class XRootDFS(FS):
             # Convert query string in URL into a dictionary. Assumes there's no
             # duplication of fields names in query string (such as e.g.
             # '?f1=a&f1=b').
-            queryargs = dict(map(
-                lambda (k, v): (k, v[0]),
-                parse_qs(queryargs).items()
-            ))
+            queryargs = dict(
+                (k, v[0]) for k, v in parse_qs(queryargs).items())
 
             # Merge values from kwarg query into the dictionary. Conflicting
             # keys raises an exception.
@@ -130,10 +134,12 @@ class XRootDFS(FS):
         # It is resolved by adding on an additional '/' to its return value.
         if isinstance(path, binary_type):
             path = path.decode(encoding)
+        base_path = self.base_path
+        if isinstance(base_path, binary_type):
+            base_path = base_path.decode('utf-8')
         # pathjoin always returns unicode
-        return (
-            u'/' + pathjoin(self.base_path.decode('utf-8'), path)
-        ).encode(encoding)
+        path = u'/' + pathjoin(base_path, path)
+        return path.encode(encoding) if PY2 else path
 
     def _raise_status(self, path, status):
         """Raise error based on status."""
@@ -156,14 +162,19 @@ class XRootDFS(FS):
         status, res = self._client.query(flag, arg)
 
         if not status.ok:
-            if status.errno == 3013:
-                raise UnsupportedError(opname="calcualte checksum",
-                                       details=status)
-            raise FSError(details=status)
+            self._raise_query_status(status)
         return parse_qs(res) if parse else res
 
+    def _raise_query_status(self, status):
+        """Raise error based on status of a query."""
+        if status.errno == 3013:
+            raise UnsupportedError(opname="calcualte checksum",
+                                   details=status)
+        raise FSError(details=status)
+
     def open(self, path, mode='r', buffering=-1, encoding=None, errors=None,
-             newline=None, line_buffering=False, **kwargs):
+             newline=None, line_buffering=False, io_stack=False,
+             compression=None, **kwargs):
         r"""Open the given path and return a file-like object.
 
         :param path: Path to file that should be opened.
@@ -183,6 +194,17 @@ class XRootDFS(FS):
             ``\\r\\n``, ``''`` or ``None``).
         :param line_buffering: Unsupported. Anything by False will raise and
             error.
+        :param io_stack: If True, return the standard :py:mod:`io` stack
+            (e.g. an ``io.TextIOWrapper`` over an ``io.BufferedReader``) on
+            top of a :py:class:`xrootdfs.rawio.XRootDRawIO` instead of an
+            :py:class:`xrootdfs.xrdfile.XRootDFile`. Arguments then have the
+            same meaning as for :py:func:`io.open` (in particular, files are
+            opened in text mode unless ``b`` is in the mode, and
+            ``line_buffering`` is supported).
+        :param compression: Decompress the file while reading it: ``gzip``,
+            ``bz2``, ``xz``, or ``auto`` to detect the format (see
+            :py:func:`xrootdfs.compression.open_compressed`). Returns the
+            standard :py:mod:`io` stack like ``io_stack``.
 
         :rtype: A file-like object.
 
@@ -190,7 +212,10 @@ class XRootDFS(FS):
             is an file.
         :raises `fs.errors.ResourceNotFoundError`: If the path is not found.
         """
-        return XRootDFile(
+        opener = open_io if io_stack else XRootDFile
+        if compression is not None:
+            opener = partial(open_compressed, compression=compression)
+        return opener(
             self.getpathurl(path, with_querystring=True),
             mode=mode,
             buffering=buffering,
@@ -428,6 +453,11 @@ class XRootDFS(FS):
         if not status.ok:
             self._raise_status(path, status)
 
+        return self._info(stat, self._query(QueryCode.XATTR, fullpath))
+
+    @staticmethod
+    def _info(stat, res):
+        """Build info dictionary from a stat and a parsed XATTR query."""
         info = dict()
         info['size'] = stat.size
         info['offline'] = bool(stat.flags & StatInfoFlags.OFFLINE)
@@ -435,7 +465,6 @@ class XRootDFS(FS):
         info['readable'] = bool(stat.flags & StatInfoFlags.IS_READABLE)
         info['executable'] = bool(stat.flags & StatInfoFlags.X_BIT_SET)
 
-        res = self._query(QueryCode.XATTR, fullpath)
         ct = res.get('oss.ct', [None])[0]
         mt = res.get('oss.mt', [None])[0]
         at = res.get('oss.at', [None])[0]
@@ -723,10 +752,239 @@ class XRootDFS(FS):
             raise ResourceInvalidError("Path is not a file: %s" % path)
 
         value = self._query(QueryCode.CHECKSUM, self._p(path), parse=False)
-        algorithm, value = value.strip().split(" ")
-        if value[-1] == "\x00":
-            value = value[:-1]
-        return (algorithm, value)
+        return parse_checksum(value)
+
+    def xrd_map(self, path, cache=None, **kwargs):
+        """Open a file and get a read-only, sliceable view of it.
+
+        Specific to ``XRootDFS``. Closing the view closes the file.
+
+        :param path: Path to file.
+        :type path: string
+        :param cache: :py:class:`xrootdfs.cache.BlockCache` holding the pages
+            (see :py:class:`xrootdfs.pagemap.PagedView`).
+        :param kwargs: Further arguments passed to
+            :py:class:`xrootdfs.xrdfile.XRootDFile`.
+        :rtype: :py:class:`xrootdfs.pagemap.PagedView`
+        """
+        return PagedView(
+            self.open(path, 'rb', **kwargs), cache=cache, closefd=True)
+
+    def xrd_open_async(self, path, mode='r', **kwargs):
+        """Open a file asynchronously.
+
+        Specific to ``XRootDFS``. Takes the same arguments as
+        :py:meth:`open`.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` of the
+            :py:class:`xrootdfs.xrdfile.XRootDFile`.
+        """
+        return XRootDFile.open_async(
+            self.getpathurl(path, with_querystring=True), mode=mode, **kwargs)
+
+    def xrd_stat_async(self, path):
+        """Get status information of a path asynchronously.
+
+        Specific to ``XRootDFS``.
+
+        :param path: Path to retrieve information about.
+        :type path: string
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` of the XRootD
+            ``StatInfo`` object (with e.g. ``size``, ``flags`` and
+            ``modtime``).
+        """
+        return XRootDFuture(
+            errback=lambda status: self._raise_status(path, status),
+        ).submit(self._client.stat, self._p(path))
+
+    def xrd_dirlist_async(self, path="./", stat=False):
+        """List the files and directories under a path asynchronously.
+
+        Specific to ``XRootDFS``.
+
+        :param path: Path to list.
+        :type path: string
+        :param stat: If True, also retrieve status information of all entries
+            in the same request.
+        :type stat: bool
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` of the list of
+            names or, if ``stat`` is True, of ``(name, StatInfo)`` tuples.
+        """
+        def entries(res):
+            if stat:
+                return [(e.name, e.statinfo) for e in res]
+            return [e.name for e in res]
+
+        return XRootDFuture(
+            errback=lambda status: self._raise_status(path, status),
+            transform=entries,
+        ).submit(
+            self._client.dirlist, self._p(path),
+            DirListFlags.STAT if stat else DirListFlags.NONE)
+
+    def xrd_checksum_async(self, path):
+        """Get checksum of file from server asynchronously.
+
+        Specific to ``XRootDFS``. See :py:meth:`xrd_checksum`.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` of the
+            ``(algorithm, value)`` tuple.
+        """
+        return XRootDFuture(
+            errback=self._raise_query_status,
+            transform=parse_checksum,
+        ).submit(self._client.query, QueryCode.CHECKSUM, self._p(path))
+
+    def xrd_download(self, path, sink, chunksize=2*1024*1024, readahead=4):
+        """Stream a file into a sink with bounded memory usage.
+
+        Specific to ``XRootDFS``. The file is read in chunks of ``chunksize``
+        bytes while up to ``readahead`` following chunks are fetched in the
+        background, so at most ``(readahead + 1) * chunksize`` bytes are held
+        in memory at a time (unlike e.g. ``getcontents()`` which reads the
+        entire file into memory).
+
+        :param path: Path of the file to download.
+        :type path: string
+        :param sink: Object receiving the data: a file-like object (any
+            object with a ``write`` method), a hash object (``update``), a
+            socket (``sendall``) or a callable accepting each chunk.
+        :param chunksize: Size in bytes of each chunk.
+        :type chunksize: int
+        :param readahead: Number of chunks to prefetch.
+        :type readahead: int
+        :returns: Number of bytes written to the sink.
+        :raise `fs.errors.ResourceNotFoundError`: If the path is not found.
+        """
+        for method in ['write', 'update', 'sendall']:
+            if hasattr(sink, method):
+                write = getattr(sink, method)
+                break
+        else:
+            if not callable(sink):
+                raise TypeError("Sink must be a file-like, hash or socket "
+                                "object, or a callable.")
+            write = sink
+
+        nbytes = 0
+        # Streamed data is read once, so caching it would only evict
+        # blocks of other files.
+        with self.open(path, 'rb-', buffer_size=chunksize,
+                       readahead=readahead, block_cache=False,
+                       disk_cache=False) as f:
+            while True:
+                data = f.read(chunksize)
+                if not data:
+                    break
+                write(data)
+                nbytes += len(data)
+        return nbytes
+
+    def xrd_read_array(self, path, dtype, offset=0, count=-1, **kwargs):
+        """Read a file into a NumPy array, like ``numpy.fromfile()``.
+
+        Specific to ``XRootDFS``. Requires NumPy (``pip install
+        xrootdfs[numpy]``). The data is read directly into a newly allocated
+        array, with large arrays read in concurrent requests of
+        ``range_size`` bytes (see :py:class:`xrootdfs.xrdfile.XRootDFile`).
+        Use :py:meth:`xrootdfs.xrdfile.XRootDFile.readinto` to fill an
+        existing array.
+
+        :param path: Path of the file to read.
+        :type path: string
+        :param dtype: Data type of the array (e.g. ``'<f8'`` or a structured
+            data type for files of records).
+        :param offset: Offset in bytes of the first item in the file.
+        :type offset: int
+        :param count: Number of items to read (defaults to -1, i.e. all items
+            until the end of the file).
+        :type count: int
+        :param kwargs: Further arguments passed to
+            :py:class:`xrootdfs.xrdfile.XRootDFile` (e.g.
+            ``parallel_reads``).
+        :returns: One-dimensional array with the items read, which has fewer
+            than ``count`` items if the end of the file is reached.
+        """
+        import numpy
+
+        dtype = numpy.dtype(dtype)
+        with self.open(path, 'rb', **kwargs) as f:
+            if count < 0:
+                count = max(f.size - offset, 0) // dtype.itemsize
+            array = numpy.empty(count, dtype=dtype)
+            f.seek(offset)
+            nbytes = f.readinto(array)
+        if nbytes < array.nbytes:
+            array = array[:nbytes // dtype.itemsize]
+        return array
+
+    def xrd_follow(self, path, lines=False, from_start=False, interval=0.1,
+                   max_interval=5.0, timeout=None, chunksize=2*1024*1024):
+        """Follow a growing file like ``tail -f``.
+
+        Specific to ``XRootDFS``. The file is opened once, and its size is
+        polled with stat requests. Only data appended since the previous
+        poll is read. The polling interval starts at ``interval`` seconds
+        and doubles up to ``max_interval`` while the file does not grow. If
+        the file shrinks (e.g. it was truncated), it is followed from the
+        start again.
+
+        :param path: Path of the file to follow.
+        :type path: string
+        :param lines: If True, yield complete lines (including the newline)
+            instead of chunks of bytes.
+        :type lines: bool
+        :param from_start: If True, yield the existing contents of the file
+            first, otherwise only data appended after the call.
+        :type from_start: bool
+        :param interval: Initial polling interval in seconds.
+        :param max_interval: Maximum polling interval in seconds.
+        :param timeout: Stop once the file has not grown for ``timeout``
+            seconds of polling (defaults to ``None``, i.e. follow
+            indefinitely). With ``lines``, an incomplete last line is then
+            yielded as well.
+        :param chunksize: Maximum number of bytes read per request.
+        :type chunksize: int
+        :returns: Generator of byte strings.
+        :raise `fs.errors.ResourceNotFoundError`: If the path is not found.
+        """
+        with self.open(path, 'rb', block_cache=False,
+                       disk_cache=False) as f:
+            offset = 0 if from_start else f.size
+            delay, idle = interval, 0
+            pending = b("")
+            while True:
+                size = f.stat_async().result().size
+                if size < offset:
+                    # The file was truncated, so the pending line is gone.
+                    offset, pending = 0, b("")
+                if size == offset:
+                    if timeout is not None and idle >= timeout:
+                        break
+                    time.sleep(delay)
+                    idle += delay
+                    delay = min(delay * 2, max_interval)
+                    continue
+
+                delay, idle = interval, 0
+                while offset < size:
+                    data = f.read_async(
+                        offset, min(size - offset, chunksize)).result()
+                    if not data:
+                        break
+                    offset += len(data)
+                    if not lines:
+                        yield data
+                        continue
+                    data, start = pending + data, 0
+                    end = data.find(b("\n")) + 1
+                    while end:
+                        yield data[start:end]
+                        start, end = end, data.find(b("\n"), end) + 1
+                    pending = data[start:]
+
+            if pending:
+                yield pending
 
     def xrd_ping(self):
         """Ping xrootd server.
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Futures for asynchronous XRootD requests.
+
+All ``File`` and ``FileSystem`` methods of the XRootD bindings accept a
+``callback`` which is called from a client thread once the response
+arrives. An :py:class:`XRootDFuture` is such a callback, so a single Python
+thread can have many requests in flight without a thread per request:
+
+.. code-block:: python
+
+    from xrootdfs import XRootDFS
+    from xrootdfs.futures import as_completed
+
+    fs = XRootDFS("root://localhost//tmp/")
+    futures = [fs.xrd_stat_async(p) for p in fs.listdir("data")]
+    for future in as_completed(futures):
+        print(future.result().size)
+
+Asynchronous methods are e.g. :py:meth:`xrootdfs.xrdfile.XRootDFile.read_async`
+and :py:meth:`xrootdfs.fs.XRootDFS.xrd_dirlist_async`.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+
+from fs.errors import OperationTimeoutError
+from six.moves import queue
+from XRootD.client.responses import XRootDStatus
+
+
+class XRootDFuture(object):
+
+    """Result of an asynchronous XRootD request.
+
+    :param errback: Function called with the status of a failed request,
+        which raises the corresponding exception (defaults to raising an
+        ``IOError`` with the status message).
+    :param transform: Function converting the response of a successful
+        request into the result (defaults to the response itself).
+    """
+
+    def __init__(self, errback=None, transform=None):
+        """Initialize future."""
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._errback = errback
+        self._transform = transform
+        self._outcome = None
+        self.status = None
+        self.response = None
+        self.submitted = time.time()
+        self.elapsed = None
+
+    def __call__(self, status, response, hostlist):
+        """Store the response (called by the XRootD client thread)."""
+        self.elapsed = time.time() - self.submitted
+        self.status = status
+        self.response = response
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+    def submit(self, method, *args, **kwargs):
+        """Send request ``method(*args, callback=self, **kwargs)``.
+
+        :returns: The future itself.
+        """
+        status = method(*args, callback=self, **kwargs)
+        if not status.ok:
+            # Request was not sent, so the callback is never called.
+            self(status, None, None)
+        return self
+
+    @classmethod
+    def completed(cls, response=None, **kwargs):
+        """Get a future which already completed successfully.
+
+        Used for operations which need no request.
+
+        :param response: Response of the operation.
+        :param kwargs: Further arguments passed to the constructor.
+        """
+        future = cls(**kwargs)
+        future(XRootDStatus(dict(
+            status=0, code=0, ok=True, errno=0, error=False, message='',
+            fatal=False, shellcode=0,
+        )), response, None)
+        return future
+
+    def done(self):
+        """Check if the response has arrived."""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the response and return ``(status, response)``.
+
+        :raise `fs.errors.OperationTimeoutError`: If the response did not
+            arrive within ``timeout`` seconds.
+        """
+        if not self._done.wait(timeout):
+            raise OperationTimeoutError(opname="wait for response")
+        return self.status, self.response
+
+    def result(self, timeout=None):
+        """Wait for the response and return the result.
+
+        Raises the exception corresponding to the status of a failed request.
+
+        :param timeout: Maximum number of seconds to wait (defaults to
+            ``None``, i.e. wait indefinitely).
+        """
+        status, response = self.wait(timeout)
+        with self._lock:
+            if self._outcome is None:
+                try:
+                    if not status.ok:
+                        if self._errback is not None:
+                            self._errback(status)
+                        raise IOError(status.message)
+                    if self._transform is not None:
+                        response = self._transform(response)
+                    self._outcome = (True, response)
+                except Exception as e:
+                    self._outcome = (False, e)
+        ok, value = self._outcome
+        if not ok:
+            raise value
+        return value
+
+    def exception(self, timeout=None):
+        """Wait for the response and return the exception of a failure.
+
+        Returns ``None`` if the request succeeded.
+        """
+        try:
+            self.result(timeout)
+        except OperationTimeoutError:
+            raise
+        except Exception as e:
+            return e
+        return None
+
+    def add_done_callback(self, fn):
+        """Call ``fn(future)`` once the response has arrived.
+
+        ``fn`` is called immediately if the response has already arrived,
+        otherwise from the XRootD client thread.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+
+def as_completed(futures, timeout=None):
+    """Iterate over futures as their responses arrive.
+
+    :param futures: Iterable of :py:class:`XRootDFuture`.
+    :param timeout: Maximum number of seconds to wait for all responses.
+    :raise `fs.errors.OperationTimeoutError`: If not all responses arrived
+        within ``timeout`` seconds.
+    """
+    futures = list(futures)
+    done = queue.Queue()
+    for future in futures:
+        future.add_done_callback(done.put)
+
+    deadline = None if timeout is None else time.time() + timeout
+    for dummy in futures:
+        remaining = None if deadline is None else \
+            max(deadline - time.time(), 0)
+        try:
+            future = done.get(timeout=remaining)
+        except queue.Empty:
+            raise OperationTimeoutError(opname="wait for responses")
+        yield future
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Paged read-only views of remote files.
+
+A :py:class:`PagedView` can be indexed and sliced like a ``bytes`` object
+holding the contents of a file, similar to a read-only memory map. Only the
+pages overlapping the requested range are fetched from the server, and pages
+are kept in a :py:class:`xrootdfs.cache.BlockCache`, so e.g. parsing headers
+with :py:mod:`struct` neither reads the whole file nor sends a request per
+field:
+
+.. code-block:: python
+
+    import struct
+    from xrootdfs import XRootDFS
+
+    fs = XRootDFS("root://localhost//tmp/")
+    with fs.xrd_map("data.bin") as view:
+        magic, count = struct.unpack("<4sI", view[:8])
+        table = view[8:8 + 16 * count]
+"""
+
+from __future__ import absolute_import, print_function
+
+from .cache import BlockCache
+
+
+class PagedView(object):
+
+    """Read-only, sliceable view of a file fetched page by page.
+
+    Indexing returns the same as indexing a ``bytes`` object, and slicing
+    returns ``bytes``. The length of the view is the size of the file when
+    the view was created. Writes made through the file after pages have been
+    cached are not reflected, unless the pages are in the block cache of the
+    file (which is invalidated on writes).
+
+    :param xfile: :py:class:`xrootdfs.xrdfile.XRootDFile` opened for reading.
+    :param cache: :py:class:`xrootdfs.cache.BlockCache` holding the pages,
+        whose ``block_size`` is the page size. Defaults to the block cache of
+        the file, or if it has none, a cache of up to 16MB of 64KB pages for
+        this view alone.
+    :param closefd: If True, the file is closed when the view is closed.
+    """
+
+    def __init__(self, xfile, cache=None, closefd=False):
+        """Initialize view."""
+        xfile._assert_mode("r")
+        if cache is None:
+            cache = xfile._block_cache or BlockCache(
+                max_bytes=16*1024*1024, block_size=64*1024)
+        self.cache = cache
+        self._file = xfile
+        self._closefd = closefd
+        self._size = xfile.size
+
+    def __len__(self):
+        """Get size of the file."""
+        return self._size
+
+    def __getitem__(self, key):
+        """Get a byte (for an index) or ``bytes`` (for a slice)."""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._size)
+            if step == 1:
+                return self._read(start, stop - start)
+            indexes = range(start, stop, step)
+            if not indexes:
+                return self._read(0, 0)
+            lo = min(indexes[0], indexes[-1])
+            data = self._read(lo, abs(indexes[-1] - indexes[0]) + 1)
+            return data[indexes[0] - lo::step]
+
+        index = int(key)
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("index out of range")
+        return self._read(index, 1)[0]
+
+    def __enter__(self):
+        """Enter context manager method."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context manager method."""
+        self.close()
+
+    def _read(self, offset, size):
+        """Read ``size`` bytes at ``offset`` through the page cache."""
+        if self._file.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        # Pages must include data still in the write buffer of the file.
+        self._file._flush_writes()
+        cache, key = self.cache, self._file._cache_key
+        return self._file._read_blocks(
+            offset, size, cache.block_size,
+            lambda idx: cache.get(key + (idx, )),
+            lambda idx, block: cache.put(key + (idx, ), block),
+            self._file._read_disk,
+        )
+
+    def tobytes(self):
+        """Get the entire contents of the file."""
+        return self[:]
+
+    def close(self):
+        """Close the view (and the file if ``closefd`` was given)."""
+        if self._closefd:
+            self._file.close()
+
+    @property
+    def closed(self):
+        """Check if the file of the view is closed."""
+        return self._file.closed
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Raw I/O layer for use with the standard :py:mod:`io` stack.
+
+:py:class:`XRootDRawIO` implements :py:class:`io.RawIOBase` on top of
+:py:class:`xrootdfs.xrdfile.XRootDFile`, so files can be wrapped in
+:py:class:`io.BufferedReader`, :py:class:`io.BufferedWriter` or
+:py:class:`io.TextIOWrapper`. Buffering, line splitting and decoding are then
+done by the C implementation of the :py:mod:`io` module.
+
+:py:func:`open_io` builds the complete stack like the built-in
+:py:func:`io.open`:
+
+.. code-block:: python
+
+    from xrootdfs.rawio import open_io
+
+    with open_io("root://localhost//tmp/data.csv", encoding="utf-8") as f:
+        for line in f:
+            pass
+
+The same stack is returned by ``XRootDFS.open(path, io_stack=True)``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import io
+
+from fs import SEEK_CUR, SEEK_END, SEEK_SET
+
+from .xrdfile import XRootDFile
+
+
+class XRootDRawIO(io.RawIOBase):
+
+    """Unbuffered binary file over XRootD implementing ``io.RawIOBase``.
+
+    :param path: URL of the file.
+    :type path: string
+    :param mode: Mode of file to open (see
+        :py:class:`xrootdfs.xrdfile.XRootDFile`).
+    :type mode: string
+    :param kwargs: Further arguments passed to
+        :py:class:`xrootdfs.xrdfile.XRootDFile` (e.g. ``readahead``). Writes
+        are sent right away (``write_buffer_size`` defaults to 0), as the
+        buffered layers of :py:mod:`io` do not flush the raw file when they
+        are flushed.
+    """
+
+    def __init__(self, path, mode='rb', **kwargs):
+        """Initialize raw file."""
+        super(XRootDRawIO, self).__init__()
+        kwargs.setdefault('write_buffer_size', 0)
+        self._file = XRootDFile(path, mode=mode, **kwargs)
+
+    def readinto(self, b):
+        """Read up to ``len(b)`` bytes into ``b`` (0 at EOF)."""
+        self._checkClosed()
+        return self._file.readinto(b)
+
+    def readall(self):
+        """Read until EOF in as few requests as possible."""
+        self._checkClosed()
+        return self._file.read()
+
+    def write(self, b):
+        """Write the bytes-like object ``b`` and return its length."""
+        self._checkClosed()
+        data = memoryview(b).tobytes()
+        self._file.write(data)
+        return len(data)
+
+    def seek(self, offset, whence=SEEK_SET):
+        """Change the position and return the new absolute position."""
+        self._checkClosed()
+        if whence == SEEK_CUR:
+            offset += self._file.tell()
+        elif whence == SEEK_END:
+            offset += self._file.size
+        elif whence != SEEK_SET:
+            raise ValueError("Invalid whence ({0})".format(whence))
+        self._file.seek(offset, SEEK_SET)
+        return self._file.tell()
+
+    def tell(self):
+        """Get the current position."""
+        self._checkClosed()
+        return self._file.tell()
+
+    def truncate(self, size=None):
+        """Truncate the file to ``size`` (defaults to the position)."""
+        self._checkClosed()
+        if size is None:
+            size = self._file.tell()
+        self._file.truncate(size)
+        return size
+
+    def flush(self):
+        """Flush server-side write buffers."""
+        super(XRootDRawIO, self).flush()
+        self._file.flush()
+
+    def close(self):
+        """Close the file."""
+        if not self.closed:
+            try:
+                super(XRootDRawIO, self).close()
+            finally:
+                self._file.close()
+
+    def readable(self):
+        """Check if file is readable."""
+        return self._file.readable()
+
+    def writable(self):
+        """Check if file is writable."""
+        return self._file.writable()
+
+    def seekable(self):
+        """Check if file is seekable."""
+        return self._file.seekable()
+
+    @property
+    def name(self):
+        """Get URL of the file."""
+        return self._file.path
+
+    @property
+    def mode(self):
+        """Get mode of the file."""
+        return self._file.mode
+
+    @property
+    def buffer_size(self):
+        """Get the preferred size of reads (used as default buffer size)."""
+        return self._file.buffer_size
+
+
+def open_io(path, mode='r', buffering=-1, encoding=None, errors=None,
+            newline=None, line_buffering=False, **kwargs):
+    r"""Open a file over XRootD using the standard :py:mod:`io` stack.
+
+    Arguments have the same meaning as for :py:func:`io.open`. Depending on
+    the mode, the returned object is an :py:class:`io.TextIOWrapper`, an
+    :py:class:`io.BufferedReader`, :py:class:`io.BufferedWriter` or
+    :py:class:`io.BufferedRandom`, or, if ``buffering`` is 0, the
+    :py:class:`XRootDRawIO` itself.
+
+    :param path: URL of the file.
+    :type path: string
+    :param mode: Mode of file to open. ``b`` selects binary mode, otherwise
+        the file is opened in text mode.
+    :type mode: string
+    :param buffering: Pass 0 to switch buffering off (only allowed in binary
+        mode), 1 to select line buffering (only usable in text mode), and an
+        integer > 1 to indicate the size of the buffer (defaults to the
+        ``buffer_size`` of the file, i.e. 64KB).
+    :param encoding: Name of the encoding used in text mode.
+    :param errors: How encoding and decoding errors are handled in text mode.
+    :param newline: Newline handling in text mode (``None``, ``''``,
+        ``\\n``, ``\\r`` or ``\\r\\n``).
+    :param line_buffering: If True, flush the text layer on each newline.
+    :param kwargs: Further arguments passed to
+        :py:class:`xrootdfs.xrdfile.XRootDFile` (e.g. ``readahead``).
+    """
+    return wrap_raw(
+        XRootDRawIO(path, mode=mode.replace('t', ''), **kwargs), mode,
+        buffering=buffering, encoding=encoding, errors=errors,
+        newline=newline, line_buffering=line_buffering)
+
+
+def wrap_raw(raw, mode, buffering=-1, encoding=None, errors=None,
+             newline=None, line_buffering=False):
+    """Wrap a raw file in buffered and text layers like :py:func:`open_io`.
+
+    The raw file is closed if the arguments are invalid.
+
+    :param raw: :py:class:`io.RawIOBase` to wrap.
+    :param mode: Mode the file was opened with. The file is wrapped in a
+        text layer unless ``b`` is in the mode.
+    """
+    try:
+        binary = 'b' in mode
+        if binary and 't' in mode:
+            raise ValueError("Can't have text and binary mode at once")
+        if binary and (encoding is not None or errors is not None or
+                       newline is not None):
+            raise ValueError("Encoding, errors and newline are not "
+                             "supported in binary mode")
+        if buffering == 0 and not binary:
+            raise ValueError("Can't have unbuffered text I/O")
+
+        if buffering == 1 and not binary:
+            line_buffering = True
+        if buffering < 0 or buffering == 1:
+            buffering = raw.buffer_size
+        if buffering == 0:
+            return raw
+
+        if raw.readable() and raw.writable():
+            buffered = io.BufferedRandom(raw, buffering)
+        elif raw.writable():
+            buffered = io.BufferedWriter(raw, buffering)
+        else:
+            buffered = io.BufferedReader(raw, buffering)
+        if binary:
+            return buffered
+
+        return io.TextIOWrapper(
+            buffered, encoding=encoding, errors=errors, newline=newline,
+            line_buffering=line_buffering)
+    except Exception:
+        raw.close()
+        raise
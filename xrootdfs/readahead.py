@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Read-ahead of sequentially accessed files.
+
+Each read of a :py:class:`xrootdfs.xrdfile.XRootDFile` is a synchronous round
+trip to the server, so a sequential scan is bound by the latency of the link
+rather than by its bandwidth. :py:class:`ReadAhead` detects sequential access
+and keeps a window of upcoming chunks in flight using the asynchronous
+(callback) interface of the XRootD bindings (see
+:py:mod:`xrootdfs.futures`).
+
+The best chunk size and read-ahead depth depend on the bandwidth-delay product
+of the connection. :py:class:`AdaptiveTuner` estimates it from the latency and
+throughput of completed requests and adjusts both accordingly.
+"""
+
+from __future__ import absolute_import, print_function
+
+from collections import deque
+
+from six import b
+
+from .futures import XRootDFuture
+
+
+class AdaptiveTuner(object):
+
+    """Adapt chunk size and read-ahead depth to the observed connection.
+
+    The round-trip time is estimated as the shortest duration of recent
+    requests, and the bandwidth as their highest throughput. As long as
+    requests take less than twice the round-trip time, they are dominated by
+    latency and the chunk size is doubled. If they take more than four times
+    the round-trip time, the chunk size is halved. The read-ahead depth is
+    set so that the bytes in flight cover the estimated bandwidth-delay
+    product.
+
+    :param chunksize: Initial chunk size in bytes.
+    :param min_chunksize: Minimum chunk size in bytes (defaults to 64KB).
+    :param max_chunksize: Maximum chunk size in bytes (defaults to 16MB).
+    :param max_window: Maximum read-ahead depth in chunks (defaults to 16).
+    :param samples: Number of recent requests to base estimates on.
+    """
+
+    def __init__(self, chunksize, min_chunksize=64*1024,
+                 max_chunksize=16*1024*1024, max_window=16, samples=16):
+        """Initialize tuner."""
+        self.min_chunksize = min_chunksize
+        self.max_chunksize = max_chunksize
+        self.max_window = max_window
+        self.chunksize = min(max(chunksize, min_chunksize), max_chunksize)
+        self.window = 1
+        self.rtt = None
+        self.bandwidth = None
+        self._samples = deque(maxlen=samples)
+
+    @property
+    def bdp(self):
+        """Estimated bandwidth-delay product in bytes."""
+        if self.rtt is None:
+            return None
+        return int(self.bandwidth * self.rtt)
+
+    def update(self, nbytes, elapsed):
+        """Record a completed request of ``nbytes`` taking ``elapsed`` secs."""
+        if nbytes <= 0 or elapsed <= 0:
+            return
+        self._samples.append((nbytes, elapsed))
+        self.rtt = min(e for n, e in self._samples)
+        self.bandwidth = max(float(n) / e for n, e in self._samples)
+
+        if elapsed < 2 * self.rtt and nbytes >= self.chunksize:
+            self.chunksize = min(self.chunksize * 2, self.max_chunksize)
+        elif elapsed > 4 * self.rtt:
+            self.chunksize = max(self.chunksize // 2, self.min_chunksize)
+
+        self.window = min(
+            max(-(-self.bdp // self.chunksize), 1), self.max_window)
+
+
+class ReadAhead(object):
+
+    """Prefetch upcoming chunks of a sequentially read file.
+
+    Once ``trigger`` consecutive reads have started where the previous one
+    ended, the chunks covering the current read plus ``window`` following
+    chunks are requested asynchronously, and subsequent reads are served
+    from memory as soon as their chunks arrive. ``chunksize`` and ``window``
+    may be changed at any time and apply to chunks requested afterwards.
+
+    :param xfile: XRootD ``File`` object to read from.
+    :param chunksize: Size in bytes of each prefetched chunk.
+    :param window: Number of chunks to keep in flight ahead of the reader.
+    :param trigger: Number of consecutive sequential reads required before
+        prefetching starts.
+    :param tuner: Optional :py:class:`AdaptiveTuner` which is updated with
+        each received chunk and controls ``chunksize`` and ``window``.
+    """
+
+    def __init__(self, xfile, chunksize, window, trigger=1, tuner=None):
+        """Initialize read-ahead engine."""
+        self._file = xfile
+        self.chunksize = chunksize
+        self.window = window
+        self.trigger = trigger
+        self.tuner = tuner
+        self._chunks = deque()
+        self._next = None
+        self._streak = 0
+
+    def read(self, offset, size, filesize):
+        """Read ``size`` bytes at ``offset`` from prefetched chunks.
+
+        Returns ``None`` if the read is not part of a sequential scan or if
+        prefetching failed, in which case the caller should read the data
+        directly from the server.
+
+        :param offset: Offset of first byte to read.
+        :param size: Number of bytes to read.
+        :param filesize: Current size of the file. No chunks are prefetched
+            beyond this offset.
+        """
+        parts = self._parts(offset, size, filesize)
+        if parts is None:
+            return None
+        parts = [data[start:stop] for data, start, stop in parts]
+        return parts[0] if len(parts) == 1 else b("").join(parts)
+
+    def readinto(self, offset, view, filesize):
+        """Read into ``view`` at ``offset`` from prefetched chunks.
+
+        Like :py:meth:`read`, but copies the data directly from the received
+        chunks into the writable byte memoryview ``view``. Returns the number
+        of bytes read, or ``None`` if the data must be read from the server.
+        """
+        parts = self._parts(offset, len(view), filesize)
+        if parts is None:
+            return None
+        pos = 0
+        for data, start, stop in parts:
+            chunk = memoryview(data)[start:stop]
+            view[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        return pos
+
+    def _parts(self, offset, size, filesize):
+        """Get the chunk slices covering ``size`` bytes at ``offset``.
+
+        Returns a list of ``(data, start, stop)`` tuples, or ``None`` if the
+        data is not prefetched.
+        """
+        sequential = offset == self._next
+        self._streak = self._streak + 1 if sequential else 0
+        self._next = offset + size
+
+        if self._streak < self.trigger or offset >= filesize:
+            if not sequential:
+                self.clear()
+            return None
+
+        # Release chunks the reader has moved past.
+        chunks = self._chunks
+        while chunks and chunks[0][0] + chunks[0][1] <= offset:
+            chunks.popleft()
+        if chunks and chunks[0][0] > offset:
+            chunks.clear()
+
+        end = min(offset + size, filesize)
+        self._schedule(offset, end, filesize)
+
+        parts = []
+        for start, chunksize, handler in chunks:
+            if start >= end:
+                break
+            status, data = handler.wait()
+            if not status.ok:
+                self.clear()
+                return None
+            if handler.elapsed is not None and self.tuner is not None:
+                self.tuner.update(len(data), handler.elapsed)
+                self.chunksize = self.tuner.chunksize
+                self.window = self.tuner.window
+                handler.elapsed = None
+            parts.append((
+                data,
+                min(max(offset - start, 0), len(data)),
+                min(end - start, len(data)),
+            ))
+            if len(data) < chunksize:
+                # File is shorter than expected (e.g. truncated remotely).
+                break
+
+        return parts
+
+    def clear(self):
+        """Discard all prefetched chunks (e.g. after the file was modified).
+
+        Requests which are still in flight complete in the background and
+        their responses are dropped.
+        """
+        self._chunks = deque()
+        self._next = None
+        self._streak = 0
+
+    def _schedule(self, offset, end, filesize):
+        """Request chunks covering ``offset`` to ``end`` plus the window."""
+        chunks = self._chunks
+        start = chunks[-1][0] + chunks[-1][1] if chunks else offset
+        ahead = sum(1 for c in chunks if c[0] >= end)
+        while start < filesize and (start < end or ahead < self.window):
+            handler = XRootDFuture().submit(
+                self._file.read, offset=start, size=self.chunksize)
+            chunks.append((start, self.chunksize, handler))
+            if start >= end:
+                ahead += 1
+            start += self.chunksize
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of xrootdfs
+# Copyright (C) 2015 CERN.
+#
+# xrootdfs is free software; you can redistribute it and/or modify it under the
+# terms of the Revised BSD License; see LICENSE file for more details.
+
+"""Retrying of requests failing with transient errors.
+
+By default, a failed request raises an error right away, so a single
+redirector or network hiccup aborts a long transfer. Files opened with a
+:py:class:`RetryPolicy` instead reopen the file and resend the failed request
+after a growing delay:
+
+.. code-block:: python
+
+    from xrootdfs import XRootDFile
+    from xrootdfs.retry import RetryPolicy
+
+    f = XRootDFile("root://localhost//tmp/data.bin", "rb",
+                   retry=RetryPolicy(retries=8, max_backoff=120))
+
+Requests carry absolute offsets, so a resent request resumes the transfer
+where it failed. Files opened for writing are reopened for update (i.e.
+without truncating them), and the data already written is kept.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+
+#: Client status codes of transient errors (socket errors and timeouts,
+#: disconnections, invalid sessions, expired and interrupted operations).
+TRANSIENT_CODES = frozenset([1, 102, 103, 104, 107, 108, 109, 206, 207])
+
+#: Server error numbers of transient errors (file not open, e.g. after the
+#: server restarted, server error, no server available, server overloaded).
+TRANSIENT_ERRNOS = frozenset([3004, 3012, 3014, 3024])
+
+
+def is_transient(status):
+    """Check if a failed request status is worth retrying."""
+    return status.code in TRANSIENT_CODES or status.errno in TRANSIENT_ERRNOS
+
+
+class RetryPolicy(object):
+
+    """Exponential backoff with jitter.
+
+    The n-th retry waits ``backoff * factor ** (n - 1)`` seconds, at most
+    ``max_backoff`` seconds, of which a random fraction of up to ``jitter``
+    is subtracted, so that clients failing at the same time do not retry in
+    lockstep.
+
+    :param retries: Maximum number of retries of a request (defaults to 5).
+    :param backoff: Delay in seconds before the first retry (defaults to 1).
+    :param factor: Factor by which the delay grows with each retry (defaults
+        to 2).
+    :param max_backoff: Maximum delay in seconds (defaults to 60).
+    :param jitter: Maximum fraction of the delay which is randomly subtracted
+        (defaults to 0.5).
+    :param retryable: Function called with the status of a failed request,
+        returning True if the request should be retried (defaults to
+        :py:func:`is_transient`).
+    """
+
+    def __init__(self, retries=5, backoff=1.0, factor=2.0, max_backoff=60.0,
+                 jitter=0.5, retryable=is_transient):
+        """Initialize retry policy."""
+        self.retries = retries
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retryable = retryable
+
+    def delays(self):
+        """Iterate over the delays before each retry."""
+        delay = self.backoff
+        for dummy in range(self.retries):
+            yield min(delay, self.max_backoff) * \
+                (1 - self.jitter * random.random())
+            delay *= self.factor
@@ -11,8 +11,8 @@
 from __future__ import absolute_import, print_function
 
 import re
-from urlparse import urlparse
 
+from six.moves.urllib.parse import urlparse
 from XRootD.client import URL
 from XRootD.client.flags import OpenFlags
 
@@ -51,6 +51,30 @@ def spliturl(fs_url):
     return root_url, path, query
 
 
+def byteview(buf):
+    """Get a writable, one-dimensional byte memoryview of a buffer.
+
+    Accepts any object supporting the buffer protocol, e.g. ``bytearray``,
+    ``memoryview`` or a C-contiguous NumPy array.
+    """
+    view = memoryview(buf)
+    if view.readonly:
+        raise TypeError("Buffer is read-only.")
+    if view.ndim == 1 and view.itemsize == 1:
+        # Python 2 memoryviews created by the io module have an undefined
+        # format, which must not be accessed.
+        if not hasattr(view, 'cast') or view.format == 'B':
+            return view
+    if hasattr(view, 'cast'):
+        return view.cast('B')
+    # Python 2 memoryviews cannot be cast, but NumPy arrays can be viewed as
+    # bytes without copying.
+    flags = getattr(buf, 'flags', None)
+    if flags is not None and flags['C_CONTIGUOUS']:
+        return memoryview(buf.reshape(-1).view('B'))
+    raise TypeError("Buffer must be a contiguous byte buffer.")
+
+
 def translate_file_mode_to_flags(mode='r'):
     """Translate a PyFS mode string to a combination of XRootD OpenFlags."""
     flags = 0
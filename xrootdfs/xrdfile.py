@@ -10,18 +10,38 @@
 
 from __future__ import absolute_import, print_function
 
+import codecs
+import re
 import sys
+import time
+from collections import deque
 
 from fs import SEEK_CUR, SEEK_END, SEEK_SET
 from fs.errors import InvalidPathError, PathError, ResourceNotFoundError, \
     UnsupportedError
 from fs.path import basename
 from six import b, binary_type, text_type
-from XRootD.client import File
-
-from .utils import is_valid_path, is_valid_url, spliturl, \
+from XRootD.client import File, FileSystem
+from XRootD.client.flags import OpenFlags, QueryCode
+
+from .cache import get_block_cache, get_disk_cache
+from .checksum import Checksum, parse_checksum
+from .coalesce import ReadCoalescer
+from .futures import XRootDFuture
+from .pagemap import PagedView
+from .readahead import AdaptiveTuner, ReadAhead
+from .retry import RetryPolicy
+from .utils import byteview, is_valid_path, is_valid_url, spliturl, \
     translate_file_mode_to_flags
 
+#: Maximum number of chunks in a single vector read request.
+READV_MAX_CHUNKS = 1024
+
+#: Maximum size of a single chunk in a vector read request.
+READV_MAX_CHUNK_SIZE = 2097136
+
+_NEWLINES_RE = re.compile(u'(\r\n|\r|\n)')
+
 
 class XRootDFile(object):
 
@@ -43,6 +63,13 @@ class XRootDFile(object):
     * ``a+`` - Open the file for reading and writing; create the file
       if it doesn't exist; place pointer at end of file.
 
+    Add ``t`` to the mode string to open the file in text mode. Reading
+    then returns unicode strings, which are decoded with an incremental
+    decoder in chunks of ``buffer_size`` bytes, and lines are split in bulk
+    with universal newline support (see ``newline``). As with iteration over
+    Python 2 files, the file position is advanced in whole chunks while
+    reading in text mode.
+
 
     .. note::
        Streamed reading/writing modes has no performance advantages over
@@ -62,26 +89,206 @@ class XRootDFile(object):
         decoding errors are to be handled (e.g. ``strict``, ``ignore`` or
         ``replace``).
     :param newline: Newline character to use (either ``\\n``, ``\\r``,
-        ``\\r\\n``, ``''`` or ``None``).
+        ``\\r\\n``, ``''`` or ``None``). In text mode, ``None`` enables
+        universal newlines (``\\n``, ``\\r`` and ``\\r\\n`` end lines and
+        are translated to ``\\n``), ``''`` recognizes all three without
+        translating them, and any other value ends lines only with the given
+        string and translates ``\\n`` to it when writing.
     :param line_buffering: Unsupported. Anything by False will raise and
         error.
     :param buffer_size: Buffer size used when reading files (defaults to 64K).
         This can likely be optimized to chunks up to 2MB depending on your
         desired memory usage.
+    :param write_buffer_size: Size in bytes of the write buffer (defaults to
+        1MB). Written data is collected in the buffer and sent in chunks
+        aligned to multiples of this size once the buffer is full, or when
+        the file is flushed, closed, truncated, read or moved to a position
+        outside of the buffered data. Errors of buffered writes are raised
+        by the call sending them. Pass 0 (or ``buffering=0``) to send each
+        write right away.
+    :param write_window: Number of full chunks of the write buffer which are
+        written asynchronously, while further data is written to the buffer
+        (defaults to 0, i.e. chunks are written synchronously). At most
+        ``write_window`` writes are in flight at a time, which bounds the
+        memory used. Errors of asynchronous writes are raised by the next
+        call to :py:meth:`write` or by the next operation waiting for all
+        writes to complete (e.g. :py:meth:`flush` or :py:meth:`close`).
+    :param readahead: Number of chunks of ``buffer_size`` bytes to keep in
+        flight ahead of the reader when the file is read sequentially
+        (defaults to 0, i.e. no read-ahead). See
+        :py:class:`xrootdfs.readahead.ReadAhead`.
+    :param block_cache: :py:class:`xrootdfs.cache.BlockCache` to read
+        through. Defaults to the process-wide cache (see
+        :py:func:`xrootdfs.cache.set_block_cache`) for files opened for
+        reading only. Pass ``False`` to bypass caching.
+    :param disk_cache: :py:class:`xrootdfs.cache.DiskCache` to read
+        through. Defaults to the process-wide disk cache (see
+        :py:func:`xrootdfs.cache.set_disk_cache`) for files opened for
+        reading only. Pass ``False`` to bypass the disk cache.
+    :param parallel_reads: Number of concurrent requests used for reads
+        larger than ``range_size`` (defaults to 4). Pass 1 to read large
+        ranges in a single request.
+    :param range_size: Size in bytes of each concurrent request of large
+        reads (defaults to 8MB).
+    :param adaptive: If True, ``buffer_size`` and the read-ahead depth are
+        continuously adjusted to the latency and throughput observed on the
+        connection (see :py:class:`xrootdfs.readahead.AdaptiveTuner`), with
+        ``buffer_size`` as the initial chunk size. Implies read-ahead.
+    :param checksum: Name of a checksum algorithm (e.g. ``adler32``,
+        ``crc32c``, ``md5`` or ``sha256``, see :py:mod:`xrootdfs.checksum`)
+        to compute over the data as it is read or written. Once the whole
+        file has been read or written sequentially, the checksum is available
+        from :py:meth:`hexdigest`, and after closing the file as
+        ``checksum`` attribute (an ``(algorithm, value)`` tuple like
+        :py:meth:`xrootdfs.fs.XRootDFS.xrd_checksum` returns). Data read
+        with e.g. :py:meth:`readv` or :py:meth:`read_async` is not included.
+    :param verify_checksum: If True, the computed checksum is compared with
+        the checksum calculated by the server when the file is closed with
+        :py:meth:`close`, and ``IOError`` is raised if they differ.
+    :param lazy: If True, a file opened for reading only is not opened on the
+        server until it is first accessed, so errors such as a missing file
+        are only raised then (defaults to False).
+    :param retry: :py:class:`xrootdfs.retry.RetryPolicy`, or a number of
+        retries with the default policy, used to reopen the file and resend
+        requests failing with transient errors (e.g. disconnections). The
+        transfer then resumes at the offset of the failed request. Only
+        synchronous operations are retried. Defaults to no retries.
     """
 
     def __init__(self, path, mode='r', buffering=-1, encoding=None,
                  errors=None, newline=None, line_buffering=False,
-                 buffer_size=None, **kwargs):
+                 buffer_size=None, readahead=0, block_cache=None,
+                 disk_cache=None, parallel_reads=4, range_size=None,
+                 adaptive=False, checksum=None, verify_checksum=False,
+                 lazy=False, retry=None, write_buffer_size=None,
+                 write_window=0, **kwargs):
         """XRootDFile constructor.
 
         Raises PathError if the given path isn't a valid XRootD URL,
         and InvalidPathError if it isn't a valid XRootD file path.
         """
+        self._setup(path, mode, buffering, encoding, errors, newline,
+                    line_buffering, buffer_size, readahead, block_cache,
+                    disk_cache, parallel_reads, range_size, adaptive,
+                    checksum, verify_checksum, retry, write_buffer_size,
+                    write_window)
+
+        self._lazy = lazy and not self.writable()
+        if not self._lazy:
+            self._open()
+
+    def _open(self):
+        """Open the file on the server."""
+        statmsg, response = self._file.open(self.path, flags=self._flags)
+
+        if not statmsg.ok:
+            statmsg, response = self._retry(
+                statmsg, lambda: self._reopen(self._flags))
+        if not statmsg.ok:
+            self._raise_status(self.path, statmsg,
+                               "instantiating file ({0})".format(self.path))
+
+        self._opened()
+
+    def _reopen(self, flags):
+        """Replace the file handle with a newly opened one."""
+        # The old handle may be broken, so don't wait for it to close.
+        self._file.close(callback=lambda *args: None)
+        self._file = File()
+        ra = self._readahead
+        if ra is not None:
+            self._readahead = ReadAhead(
+                self._file, ra.chunksize, ra.window, trigger=ra.trigger,
+                tuner=ra.tuner)
+        return self._file.open(self.path, flags=flags)
+
+    def _retry(self, statmsg, request):
+        """Repeat a failed request while the retry policy allows it.
+
+        :param statmsg: Status of the failed request.
+        :param request: Function sending the request, returning a
+            ``(status, response)`` tuple.
+        """
+        response = None
+        if self.retry is not None:
+            for delay in self.retry.delays():
+                if not self.retry.retryable(statmsg):
+                    break
+                time.sleep(delay)
+                statmsg, response = request()
+                if statmsg.ok:
+                    break
+        return statmsg, response
+
+    def _request(self, method, *args, **kwargs):
+        """Send a request, retrying it on a reopened file if it fails.
+
+        :param method: Name of the :py:class:`XRootD.client.File` method.
+        """
+        handle = self._file
+        statmsg, response = getattr(handle, method)(*args, **kwargs)
+        if not statmsg.ok:
+            statmsg, response = self._retry_request(
+                handle, statmsg, method, *args, **kwargs)
+        return statmsg, response
+
+    def _retry_request(self, handle, statmsg, method, *args, **kwargs):
+        """Retry a failed request on a reopened file (see ``retry``).
+
+        The file is only reopened if it is still open with ``handle``, the
+        handle the request failed on. Concurrent requests failing together
+        are thus resent on the same reopened file.
+        """
+        failed = [handle]
+
+        def request():
+            statmsg = None
+            if self._file is failed[0]:
+                # Reopen for update, so that written data is not truncated.
+                statmsg, response = self._reopen(
+                    OpenFlags.UPDATE if self.writable() else self._flags)
+            failed[0] = self._file
+            if statmsg is None or statmsg.ok:
+                statmsg, response = getattr(self._file, method)(
+                    *args, **kwargs)
+            return statmsg, response
+
+        return self._retry(statmsg, request)
+
+    def _ensure_open(self):
+        """Open the file if opening was deferred (see ``lazy``)."""
+        if self._lazy:
+            self._lazy = False
+            self._open()
+
+    @classmethod
+    def open_async(cls, path, mode='r', **kwargs):
+        """Open a file asynchronously.
+
+        Takes the same arguments as the constructor, but returns a
+        :py:class:`xrootdfs.futures.XRootDFuture` of the opened file instead
+        of waiting for the server to respond.
+        """
+        xfile = cls.__new__(cls)
+        xfile._setup(path, mode, **kwargs)
+        return XRootDFuture(
+            errback=lambda statmsg: xfile._raise_status(
+                path, statmsg, "instantiating file ({0})".format(path)),
+            transform=lambda response: xfile._opened(),
+        ).submit(xfile._file.open, path, flags=xfile._flags)
+
+    def _setup(self, path, mode='r', buffering=-1, encoding=None,
+               errors=None, newline=None, line_buffering=False,
+               buffer_size=None, readahead=0, block_cache=None,
+               disk_cache=None, parallel_reads=4, range_size=None,
+               adaptive=False, checksum=None, verify_checksum=False,
+               retry=None, write_buffer_size=None, write_window=0,
+               **kwargs):
+        """Validate arguments and initialize attributes before opening."""
         if not is_valid_url(path):
             raise PathError(path)
 
-        xpath = spliturl(path)[1]
+        root_url, xpath = spliturl(path)[:2]
 
         if not is_valid_path(xpath):
             raise InvalidPathError(xpath)
@@ -94,6 +301,9 @@ class XRootDFile(object):
             raise NotImplementedError("Line buffering for writing is not "
                                       "supported.")
 
+        if 'b' in mode and 't' in mode:
+            raise ValueError("Can't have text and binary mode at once")
+
         buffering = int(buffering)
         if buffering == 1 and 'b' in mode:
             raise UnsupportedError(
@@ -109,27 +319,89 @@ class XRootDFile(object):
         self.errors = errors or 'strict'
         self.buffer_size = buffer_size or 64*1024
         self.buffering = buffering
+        self.parallel_reads = parallel_reads
+        self.range_size = range_size or 8*1024*1024
+        if write_buffer_size is None:
+            write_buffer_size = 0 if buffering == 0 else 1024*1024
+        self.write_buffer_size = write_buffer_size
+        self.write_window = write_window
         self._file = File()
+        self._lazy = False
         self._ipp = 0
         self._size = -1
         self._iterator = None
         self._newline = newline or b("\n")
-        self._buffer = b('')
+        self._buffer = bytearray()
         self._buffer_pos = 0
+        self._wbuffer = bytearray()
+        self._wbuffer_pos = 0
+        self._writes = deque()
+        self._lines = deque()
+        self._lines_pos = None
+        self._text = 't' in mode
+        self._text_newline = newline
+        self._pending = u''
+        self._decoder = None
+        if self._text:
+            self._decoder = codecs.getincrementaldecoder(self.encoding)(
+                self.errors)
+        self._readahead = None
+        self._tuner = AdaptiveTuner(self.buffer_size) if adaptive else None
+        self.checksum = None
+        self.verify_checksum = verify_checksum
+        self._checksum = Checksum(checksum) if checksum else None
+        self._checksum_pos = 0
+        self._cache_key = (root_url, xpath)
+        if retry is not None and not isinstance(retry, RetryPolicy):
+            retry = RetryPolicy(retries=retry)
+        self.retry = retry
+
+        if block_cache is None and not self.writable():
+            block_cache = get_block_cache()
+        self._block_cache = block_cache or None
+        self._disk_cache = None
+        self._modified = False
 
         # flag translation
         self._flags = translate_file_mode_to_flags(mode)
+        self._open_args = (disk_cache, readahead)
 
-        statmsg, response = self._file.open(path, flags=self._flags)
-
+    def _opened(self):
+        """Finish initialization once the file has been opened."""
+        # The client keeps the status information returned in the response
+        # to the open request, so no further request is sent here.
+        statmsg, stat = self._file.stat()
         if not statmsg.ok:
-            self._raise_status(self.path, statmsg,
-                               "instantiating file ({0})".format(path))
+            self._raise_status(self.path, statmsg, "retrieving size")
+        self._size = stat.size
+
+        disk_cache, readahead = self._open_args
+        root_url, xpath = self._cache_key
+        if self._block_cache is not None:
+            self._block_cache.validate(
+                root_url, xpath, (stat.size, stat.modtime))
+        if disk_cache is None and not self.writable():
+            disk_cache = get_disk_cache()
+        if disk_cache:
+            self._disk_cache = disk_cache.entry(
+                root_url, xpath, self._version(disk_cache.validate, stat))
+
+        if self._tuner is not None:
+            self.buffer_size = self._tuner.chunksize
+            readahead = self._tuner.window
+
+        if readahead > 0:
+            # Streamed reads are always sequential, so prefetch immediately.
+            self._readahead = ReadAhead(
+                self._file, self.buffer_size, readahead,
+                trigger=0 if '-' in self.mode else 1, tuner=self._tuner)
 
         # Deal with the modes
         if 'a' in self.mode:
             self.seek(self.size, SEEK_SET)
 
+        return self
+
     def _raise_status(self, path, status, source=None):
         """Raise error based on status."""
         if status.errno == 3011:
@@ -151,7 +423,7 @@ class XRootDFile(object):
 
         if self.buffering == 1 or \
            (self.buffering == -1 and 'b' not in self.mode):
-            self._next_func = self.readline
+            self._next_func = self._next_line
             self._next_args = ([], dict())
         elif self.buffering > 1:
             self._next_args = ([], dict(sizehint=self.buffering))
@@ -173,6 +445,8 @@ class XRootDFile(object):
             raise StopIteration
         return item
 
+    __next__ = next
+
     def read(self, sizehint=-1):
         """Read ``sizehint`` bytes from the file object.
 
@@ -186,16 +460,13 @@ class XRootDFile(object):
 
         self._assert_mode("r-")
 
+        if self._text:
+            return self._read_text(sizehint)
+
         chunksize = sizehint if sizehint > 0 else self.size
 
         # Read data
-        statmsg, res = self._file.read(
-            offset=self._ipp,
-            size=chunksize,
-        )
-
-        if not statmsg.ok:
-            self._raise_status(self.path, statmsg, "reading")
+        res = self._read_buffered(self._ipp, chunksize)
 
         # Increment internal file pointer.
         self._ipp = min(
@@ -205,35 +476,623 @@ class XRootDFile(object):
 
         return res
 
+    def readinto(self, buffer):
+        """Read bytes into a pre-allocated, writable buffer.
+
+        Reads up to ``len(buffer)`` bytes into ``buffer`` (e.g. a
+        ``bytearray``, ``memoryview`` or NumPy array) and returns the number
+        of bytes read (0 at EOF). Data is copied once from the received
+        response into ``buffer``.
+
+        :param buffer: Writable object supporting the buffer protocol.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._assert_mode("r-")
+
+        n = self._readinto(self._ipp, byteview(buffer))
+        self._ipp += n
+        return n
+
+    def readv(self, chunks):
+        """Read several ranges of the file with vector read requests.
+
+        The ranges are sent to the server in a single request, unless they
+        exceed the server limits (:py:data:`READV_MAX_CHUNKS` chunks per
+        request and :py:data:`READV_MAX_CHUNK_SIZE` bytes per chunk), in which
+        case they are split transparently into several requests. The file
+        pointer is not moved.
+
+        :param chunks: List of ``(offset, size)`` tuples.
+        :returns: List of strings with the data of each range, in the same
+            order as ``chunks``. Ranges extending past the end of the file are
+            truncated.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._ensure_open()
+
+        self._assert_mode("r")
+
+        self._flush_writes()
+
+        results = [[] for dummy in chunks]
+        for batch in self._readv_batches(chunks):
+            statmsg, res = self._request('vector_read', chunks=[
+                (offset, size) for dummy, offset, size in batch])
+
+            if not statmsg.ok:
+                self._raise_status(self.path, statmsg, "reading")
+
+            for (i, dummy, dummy), chunk in zip(batch, res.chunks):
+                results[i].append(chunk.buffer)
+
+        return [b("").join(parts) for parts in results]
+
+    def _readv_batches(self, chunks, filesize=None):
+        """Split ranges into vector read requests within the server limits.
+
+        Ranges are truncated at the end of the file.
+
+        :param filesize: Size of the file (defaults to :py:attr:`size`).
+
+        :returns: List of requests, each a list of ``(index, offset, size)``
+            tuples where ``index`` is the index of the range in ``chunks``.
+        """
+        if filesize is None:
+            filesize = self.size
+        pieces = []
+        for i, (offset, size) in enumerate(chunks):
+            end = min(offset + size, filesize)
+            for start in range(offset, end, READV_MAX_CHUNK_SIZE):
+                pieces.append(
+                    (i, start, min(end - start, READV_MAX_CHUNK_SIZE)))
+
+        return [pieces[first:first + READV_MAX_CHUNKS]
+                for first in range(0, len(pieces), READV_MAX_CHUNKS)]
+
+    def coalescer(self, gap=4*1024, delay=0.005, max_reads=1024):
+        """Get a collector of reads merging nearby ranges into few requests.
+
+        Arguments are described in
+        :py:class:`xrootdfs.coalesce.ReadCoalescer`.
+
+        :rtype: :py:class:`xrootdfs.coalesce.ReadCoalescer`
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._ensure_open()
+        return ReadCoalescer(
+            self, gap=gap, delay=delay, max_reads=max_reads)
+
+    def map(self, cache=None):
+        """Get a read-only, sliceable view of the file.
+
+        Slicing the view fetches only the pages overlapping the slice. The
+        file pointer is not moved.
+
+        :param cache: :py:class:`xrootdfs.cache.BlockCache` holding the pages
+            (see :py:class:`xrootdfs.pagemap.PagedView`).
+        :rtype: :py:class:`xrootdfs.pagemap.PagedView`
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        return PagedView(self, cache=cache)
+
+    def read_async(self, offset, size):
+        """Read ``size`` bytes at ``offset`` asynchronously.
+
+        The read bypasses read buffers and caches, and does not move the file
+        pointer.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` of the data.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._ensure_open()
+
+        self._assert_mode("r")
+
+        self._flush_writes()
+
+        return XRootDFuture(
+            errback=lambda statmsg: self._raise_status(
+                self.path, statmsg, "reading"),
+        ).submit(self._file.read, offset=offset, size=size)
+
+    def write_async(self, data, offset):
+        """Write ``data`` at ``offset`` asynchronously.
+
+        The write does not move the file pointer.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` which completes
+            when the data has been written.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._assert_mode("w")
+
+        self._flush_writes()
+        self._invalidate()
+
+        def written(future):
+            # The size is retrieved again once needed.
+            self._size = -1
+
+        data = self._encode(data)
+        if self._checksum is not None:
+            self._update_checksum(offset, data, write=True)
+
+        future = XRootDFuture(
+            errback=lambda statmsg: self._raise_status(
+                self.path, statmsg, "writing"),
+        ).submit(self._file.write, data, offset=offset)
+        future.add_done_callback(written)
+        return future
+
+    def stat_async(self):
+        """Get status information of the file asynchronously.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` of the XRootD
+            ``StatInfo`` object (with e.g. ``size`` and ``modtime``).
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._ensure_open()
+        self._flush_writes()
+
+        return XRootDFuture(
+            errback=lambda statmsg: self._raise_status(
+                self.path, statmsg, "retrieving status of"),
+        ).submit(self._file.stat, force=True)
+
+    def _read_buffered(self, offset, size):
+        """Read ``size`` bytes at ``offset`` starting from the read buffer."""
+        start = offset - self._buffer_pos
+        if not 0 <= start < len(self._buffer) or size <= 0:
+            return self._read(offset, size)
+
+        head = memoryview(self._buffer)[start:start + size].tobytes()
+        if len(head) == size:
+            return head
+        return head + self._read(offset + len(head), size - len(head))
+
+    def _readinto(self, offset, view):
+        """Read into byte memoryview ``view`` at ``offset``."""
+        if not len(view):
+            return 0
+
+        self._ensure_open()
+        self._flush_writes()
+
+        start = offset - self._buffer_pos
+        if 0 <= start < len(self._buffer):
+            # Serve the beginning from the read buffer.
+            n = min(len(view), len(self._buffer) - start)
+            view[:n] = memoryview(self._buffer)[start:start + n]
+            return n + self._readinto(offset + n, view[n:])
+
+        ra = self._readahead
+        if self._block_cache is None and self._disk_cache is None and \
+                ra is not None and len(view) <= ra.chunksize * ra.window:
+            n = ra.readinto(offset, view, self.size)
+            if n is not None:
+                if self._tuner is not None:
+                    self._tune()
+                if self._checksum is not None:
+                    self._update_checksum(offset, view[:n])
+                return n
+
+        if self._block_cache is None and self._disk_cache is None and \
+                self._parallel(len(view)):
+            n = self._fetch_into(offset, view)
+            if self._checksum is not None:
+                self._update_checksum(offset, view[:n])
+            return n
+
+        data = self._read(offset, len(view))
+        n = len(data)
+        view[:n] = data
+        return n
+
+    def _read(self, offset, size):
+        """Read ``size`` bytes at ``offset`` through the block cache."""
+        self._ensure_open()
+        self._flush_writes()
+        cache = self._block_cache
+        if cache is None:
+            data = self._read_disk(offset, size)
+        else:
+            key = self._cache_key
+            data = self._read_blocks(
+                offset, size, cache.block_size,
+                lambda idx: cache.get(key + (idx, )),
+                lambda idx, block: cache.put(key + (idx, ), block),
+                self._read_disk,
+            )
+        if self._checksum is not None:
+            self._update_checksum(offset, data)
+        return data
+
+    def _update_checksum(self, offset, data, write=False):
+        """Add data read or written at ``offset`` to the checksum.
+
+        Only data continuing the checksummed part of the file is added, and
+        overwriting that part makes the checksum unknown.
+        """
+        pos = self._checksum_pos
+        if pos is None:
+            return
+        end = offset + len(data)
+        if write and offset < pos:
+            self._checksum_pos = None
+        elif offset <= pos < end:
+            self._checksum.update(data[pos - offset:])
+            self._checksum_pos = end
+
+    def _read_disk(self, offset, size):
+        """Read ``size`` bytes at ``offset`` through the disk cache."""
+        entry = self._disk_cache
+        if entry is None:
+            return self._read_uncached(offset, size)
+
+        return self._read_blocks(
+            offset, size, entry.block_size, entry.get, entry.put,
+            self._read_uncached,
+        )
+
+    def _read_blocks(self, offset, size, bs, get, put, fetch):
+        """Read ``size`` bytes at ``offset`` from a cache of blocks.
+
+        :param bs: Block size of the cache.
+        :param get: Function returning a cached block or ``None``.
+        :param put: Function storing a block in the cache.
+        :param fetch: Function reading a range of missing blocks.
+        """
+        end = min(offset + size, self.size)
+        if size <= 0 or end <= offset:
+            return b("")
+
+        first, last = offset // bs, (end - 1) // bs
+        blocks = dict((idx, get(idx)) for idx in range(first, last + 1))
+        idx = first
+        while idx <= last:
+            if blocks[idx] is not None:
+                idx += 1
+                continue
+            # Fetch consecutive missing blocks in a single request.
+            miss = idx
+            while idx <= last and blocks[idx] is None:
+                idx += 1
+            data = fetch(miss * bs, (idx - miss) * bs)
+            for i in range(miss, idx):
+                block = data[(i - miss) * bs:(i - miss + 1) * bs]
+                put(i, block)
+                blocks[i] = block
+                if len(block) < bs:
+                    # End of file reached.
+                    break
+
+        parts = []
+        for idx in range(first, last + 1):
+            block = blocks[idx]
+            start = idx * bs
+            parts.append(block[max(offset - start, 0):end - start])
+            if len(block) < bs:
+                break
+        return parts[0] if len(parts) == 1 else b("").join(parts)
+
+    def _version(self, validate, stat):
+        """Get a value identifying the current version of the file.
+
+        Used to validate disk cache entries. Uses the server-side checksum
+        if ``validate`` is ``checksum`` and the server supports it, otherwise
+        the size and modification time of the file from ``stat``.
+        """
+        if validate == 'checksum':
+            root_url, xpath = self._cache_key
+            statmsg, res = FileSystem(root_url).query(
+                QueryCode.CHECKSUM, xpath)
+            if statmsg.ok:
+                return res.strip().rstrip("\x00").split(" ")
+
+        return [stat.size, stat.modtime]
+
+    def _read_uncached(self, offset, size):
+        """Read ``size`` bytes at ``offset`` using read-ahead if enabled."""
+        ra = self._readahead
+        if ra is not None and size <= ra.chunksize * ra.window:
+            res = ra.read(offset, size, self.size)
+            if res is not None:
+                if self._tuner is not None:
+                    self._tune()
+                return res
+        return self._fetch(offset, size)
+
+    def _parallel(self, size):
+        """Check if a read of ``size`` bytes is split in several requests."""
+        return self.parallel_reads > 1 and size > self.range_size
+
+    def _fetch_into(self, offset, view):
+        """Read into ``view`` at ``offset`` with concurrent requests.
+
+        The range is split into requests of ``range_size`` bytes, of which up
+        to ``parallel_reads`` are in flight at a time. Returns the number of
+        bytes read.
+        """
+        size = len(view)
+        starts = deque(range(0, size, self.range_size))
+        pending = deque()
+        nbytes = 0
+
+        while starts or pending:
+            while starts and len(pending) < self.parallel_reads:
+                start = starts.popleft()
+                handler = XRootDFuture().submit(
+                    self._file.read,
+                    offset=offset + start,
+                    size=min(self.range_size, size - start),
+                )
+                pending.append((start, self._file, handler))
+
+            start, handle, handler = pending.popleft()
+            statmsg, data = handler.wait()
+            if not statmsg.ok:
+                statmsg, data = self._retry_request(
+                    handle, statmsg, 'read', offset=offset + start,
+                    size=min(self.range_size, size - start))
+            if not statmsg.ok:
+                self._raise_status(self.path, statmsg, "reading")
+            view[start:start + len(data)] = data
+            if data:
+                nbytes = start + len(data)
+            if len(data) < min(self.range_size, size - start):
+                # End of file reached.
+                starts.clear()
+
+        return nbytes
+
+    def _fetch(self, offset, size):
+        """Read ``size`` bytes at ``offset`` from the server."""
+        if self._parallel(size):
+            buf = bytearray(size)
+            n = self._fetch_into(offset, memoryview(buf))
+            return bytes(buf) if n == size else memoryview(buf)[:n].tobytes()
+
+        started = time.time()
+        statmsg, res = self._request('read', offset=offset, size=size)
+
+        if not statmsg.ok:
+            self._raise_status(self.path, statmsg, "reading")
+
+        if self._tuner is not None:
+            self._tuner.update(len(res), time.time() - started)
+            self._tune()
+
+        return res
+
+    def _tune(self):
+        """Apply chunk size and read-ahead depth of the adaptive tuner."""
+        self.buffer_size = self._tuner.chunksize
+        if self._readahead is not None:
+            self._readahead.chunksize = self._tuner.chunksize
+            self._readahead.window = self._tuner.window
+
     def readline(self):
         """Read one entire line from the file.
 
         A trailing newline character is kept in the string (but may be absent
         when a file ends with an incomplete line).
+
+        Lines are found by scanning a read buffer of chunks of
+        ``buffer_size`` bytes. The buffer also retains up to ``buffer_size``
+        bytes before the current position, so reading again after small
+        forward or backward seeks does not require a new request.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._assert_mode("r-")
+
+        if self._text:
+            return self._next_line()
+
+        buf, newline = self._buffer, self._newline
+        start = self._ipp - self._buffer_pos
+        if not 0 <= start <= len(buf):
+            # Position is outside the buffered window.
+            del buf[:]
+            self._buffer_pos, start = self._ipp, 0
+
+        indx = buf.find(newline, start)
+
+        # Read chunks until first newline is found or entire file is read.
+        while indx == -1:
+            data = self._read(self._buffer_pos + len(buf), self.buffer_size)
+            if not data:
+                break
+            # Keep at most buffer_size bytes before the current position, so
+            # small backward seeks can be served from the buffer.
+            if start > self.buffer_size:
+                drop = start - self.buffer_size
+                del buf[:drop]
+                self._buffer_pos += drop
+                start -= drop
+            searchpos = max(start, len(buf) - len(newline) + 1)
+            buf.extend(data)
+            indx = buf.find(newline, searchpos)
+
+        end = len(buf) if indx == -1 else indx + len(newline)
+        self._ipp = self._buffer_pos + end
+        return memoryview(buf)[start:end].tobytes()
+
+    def iter_line_batches(self, n=1024):
+        """Get an iterator over lists of up to ``n`` lines.
+
+        The read buffer is split into lines in bulk rather than one line at a
+        time, which is considerably faster for files with many short lines.
+        The file position is at the end of the last line of a batch when the
+        batch is returned.
+
+        :param n: Maximum number of lines per batch.
+        """
+        while True:
+            lines = self._next_lines(n)
+            if not lines:
+                break
+            yield lines
+
+    def _next_line(self):
+        """Get the next line, splitting the read buffer in bulk."""
+        if self._text:
+            if self._lines and self._lines_pos == self._ipp:
+                return self._lines.popleft()
+            lines = self._next_lines(1)
+            return lines[0] if lines else u''
+        if self._lines and self._lines_pos == self._ipp:
+            line = self._lines.popleft()
+            self._ipp += len(line)
+            self._lines_pos = self._ipp
+            return line
+        lines = self._next_lines(1)
+        return lines[0] if lines else b("")
+
+    def _next_lines(self, n):
+        """Get up to ``n`` lines, splitting the read buffer in bulk.
+
+        Complete lines in the read buffer are split at once and queued. The
+        file position is only advanced as queued lines are returned, so the
+        queue is simply discarded if the position was changed in between
+        (e.g. by ``seek()`` or ``read()``).
         """
-        bits = [self._buffer if self._buffer_pos == self.tell() else b("")]
-        indx = bits[-1].find(self._newline)
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
 
-        if indx == -1:
-            # Read chunks until first newline is found or entire file is read.
-            while indx == -1:
-                bit = self.read(self.buffer_size)
-                bits.append(bit)
-                if not bit:
+        if self._text:
+            return self._next_text_lines(n)
+
+        lines = self._lines
+        if self._lines_pos != self._ipp:
+            lines.clear()
+
+        batch = []
+        while len(batch) < n:
+            if not lines and not self._split_lines():
+                # No complete line in the buffer, so read more data.
+                line = self.readline()
+                if not line:
                     break
-                indx = bit.find(self._newline)
+                batch.append(line)
+                continue
+            line = lines.popleft()
+            self._ipp += len(line)
+            batch.append(line)
 
-        if indx == -1:
-            return b("").join(bits)
+        self._lines_pos = self._ipp
+        return batch
 
-        indx += len(self._newline)
-        extra = bits[-1][indx:]
-        bits[-1] = bits[-1][:indx]
+    def _split_lines(self):
+        """Queue all complete lines in the read buffer.
 
-        self._buffer = extra
-        self._buffer_pos = self.tell()
+        Returns ``False`` if the buffer contains no complete line at the
+        current position.
+        """
+        buf, newline = self._buffer, self._newline
+        start = self._ipp - self._buffer_pos
+        if not 0 <= start < len(buf):
+            return False
+        end = buf.rfind(newline, start)
+        if end == -1:
+            return False
+
+        parts = memoryview(buf)[start:end].tobytes().split(newline)
+        self._lines.extend(part + newline for part in parts)
+        return True
 
-        return b("").join(bits)
+    def _next_text_lines(self, n):
+        """Get up to ``n`` decoded lines in text mode."""
+        self._sync_text()
+        lines = self._lines
+        while len(lines) < n and self._decode_chunk():
+            pass
+        batch = [lines.popleft() for dummy in range(min(n, len(lines)))]
+        return batch
+
+    def _read_text(self, size):
+        """Read ``size`` characters (all if negative) in text mode."""
+        self._sync_text()
+        while size < 0 or self._text_available() < size:
+            if not self._decode_chunk():
+                break
+        text = u''.join(self._lines) + self._pending
+        self._lines.clear()
+        if 0 <= size < len(text):
+            text, self._pending = text[:size], text[size:]
+        else:
+            self._pending = u''
+        return text
+
+    def _text_available(self):
+        """Get number of decoded characters which can be returned."""
+        n = sum(len(line) for line in self._lines) + len(self._pending)
+        if self._text_newline is None and self._pending.endswith(u'\r'):
+            # A following "\n" belongs to the same newline.
+            n -= 1
+        return n
+
+    def _sync_text(self):
+        """Reset the decoder if the position changed since last decoding."""
+        if self._lines_pos != self._ipp:
+            self._lines.clear()
+            self._pending = u''
+            self._decoder.reset()
+            self._lines_pos = self._ipp
+
+    def _decode_chunk(self):
+        """Decode the next chunk and queue the complete lines it contains.
+
+        Returns ``False`` at end of file once all text has been queued.
+        """
+        data = self._read(self._ipp, self.buffer_size)
+        final = not data
+        text = self._pending + self._decoder.decode(data, final)
+        self._ipp += len(data)
+        self._lines_pos = self._ipp
+        if not text:
+            # Chunk may have ended within a multi-byte character.
+            return not final
+
+        newline = self._text_newline
+        hold = u''
+        if newline in (None, '') and not final and text.endswith(u'\r'):
+            # Wait for the next chunk to see if "\r" is part of "\r\n".
+            text, hold = text[:-1], u'\r'
+
+        if newline is None:
+            text = text.replace(u'\r\n', u'\n').replace(u'\r', u'\n')
+            parts = text.split(u'\n')
+            lines = [part + u'\n' for part in parts[:-1]]
+        elif newline == '':
+            parts = _NEWLINES_RE.split(text)
+            lines = [a + b for a, b in zip(parts[:-1:2], parts[1::2])]
+            parts = parts[-1:]
+        else:
+            parts = text.split(newline)
+            lines = [part + newline for part in parts[:-1]]
+
+        self._pending = parts[-1] + hold
+        if final and self._pending:
+            lines.append(self._pending)
+            self._pending = u''
+        self._lines.extend(lines)
+        return True
 
     def readlines(self):
         """Read until EOF using readline().
@@ -250,7 +1109,7 @@ class XRootDFile(object):
         line = True
 
         while line:
-            line = self.readline()
+            line = self._next_line()
             if not line:
                 break
             yield line
@@ -264,25 +1123,118 @@ class XRootDFile(object):
         """
         self._assert_mode("w-")
 
+        self._check_writes()
+
         if 'a' in self.mode:
             self.seek(0, SEEK_END)
 
-        if not isinstance(data, binary_type):
-            if isinstance(data, bytearray):
-                data = bytes(data)
-            elif isinstance(data, text_type):
-                data = data.encode(self.encoding, self.errors)
+        self._invalidate()
 
-        statmsg, res = self._file.write(data, offset=self._ipp)
+        data = self._encode(data)
+        if self._checksum is not None:
+            self._update_checksum(self._ipp, data, write=True)
 
-        if not statmsg.ok:
-            self._raise_status(self.path, statmsg, "writing")
+        wbuf = self._wbuffer
+        if self._ipp != self._wbuffer_pos + len(wbuf):
+            self._flush_writes()
+        if not wbuf:
+            self._wbuffer_pos = self._ipp
+        wbuf.extend(data)
 
         self._ipp += len(data)
         self._size = max(self.size, self.tell())
+        if len(wbuf) >= self.write_buffer_size:
+            self._flush_writes(aligned=self.write_buffer_size > 0)
         if flushing:
             self.flush()
 
+    def _flush_writes(self, aligned=False):
+        """Send the data of the write buffer to the server.
+
+        :param aligned: If True, only send the data up to the last multiple of
+            ``write_buffer_size`` and keep the rest in the buffer. The data
+            is then written asynchronously if ``write_window`` allows it.
+            Otherwise, all writes in flight are completed first.
+        """
+        if not aligned:
+            self._wait_writes()
+
+        wbuf = self._wbuffer
+        if not wbuf:
+            return
+        size = len(wbuf)
+        if aligned:
+            bs = self.write_buffer_size
+            size = (self._wbuffer_pos + size) // bs * bs - self._wbuffer_pos
+            if size <= 0:
+                return
+
+        offset = self._wbuffer_pos
+        data = memoryview(wbuf)[:size].tobytes()
+        # Drop the data even if the write fails, so that the error is only
+        # raised once.
+        del wbuf[:size]
+        self._wbuffer_pos += size
+        if aligned and self.write_window > 0:
+            self._send_write(data, offset)
+            return
+        statmsg, res = self._request('write', data, offset=offset)
+
+        if not statmsg.ok:
+            self._raise_status(self.path, statmsg, "writing")
+
+    def _send_write(self, data, offset):
+        """Write ``data`` at ``offset`` asynchronously.
+
+        Waits for the oldest writes in flight to complete while there are
+        ``write_window`` of them.
+        """
+        writes = self._writes
+        while len(writes) >= self.write_window:
+            statmsg = self._finish_write(*writes.popleft())
+            if not statmsg.ok:
+                self._raise_status(self.path, statmsg, "writing")
+        writes.append((data, offset, XRootDFuture().submit(
+            self._file.write, data, offset=offset), self._file))
+
+    def _finish_write(self, data, offset, future, handle):
+        """Wait for an asynchronous write, retrying it if it failed."""
+        statmsg, dummy = future.wait()
+        if not statmsg.ok:
+            statmsg = self._retry_request(
+                handle, statmsg, 'write', data, offset=offset)[0]
+        return statmsg
+
+    def _check_writes(self):
+        """Raise the error of the completed writes in flight, if any."""
+        writes = self._writes
+        while writes and writes[0][2].done():
+            statmsg = self._finish_write(*writes.popleft())
+            if not statmsg.ok:
+                self._raise_status(self.path, statmsg, "writing")
+
+    def _wait_writes(self):
+        """Wait for all writes in flight and raise the first error."""
+        failed = None
+        writes = self._writes
+        while writes:
+            statmsg = self._finish_write(*writes.popleft())
+            if not statmsg.ok and failed is None:
+                failed = statmsg
+        if failed is not None:
+            self._raise_status(self.path, failed, "writing")
+
+    def _encode(self, data):
+        """Convert data to write to bytes."""
+        if not isinstance(data, binary_type):
+            if isinstance(data, bytearray):
+                data = bytes(data)
+            elif isinstance(data, text_type):
+                if self._text and self._text_newline not in (None, '', '\n'):
+                    data = data.replace(u'\n', self._text_newline)
+                data = data.encode(self.encoding, self.errors)
+        return data
+
     def writelines(self, sequence):
         """Write an sequence of lines to file."""
         for s in sequence:
@@ -321,6 +1273,9 @@ class XRootDFile(object):
         else:
             raise NotImplementedError(whence)
 
+        if self._ipp != self._wbuffer_pos + len(self._wbuffer):
+            self._flush_writes()
+
     def tell(self):
         """Get the location of the file's internal position pointer."""
         return self._ipp
@@ -336,28 +1291,153 @@ class XRootDFile(object):
         if size is None:
             size = self.tell()
 
-        statmsg = self._file.truncate(size)[0]
+        self._flush_writes()
+        self._invalidate()
+
+        statmsg = self._request('truncate', size)[0]
 
         if not statmsg.ok:
             self._raise_status(self.path, statmsg, "truncating")
 
         self._size = size
+        if self._checksum_pos is not None and size < self._checksum_pos:
+            self._checksum_pos = None
+
+    def _invalidate(self):
+        """Discard buffered and cached data after modifying the file."""
+        del self._buffer[:]
+        self._lines.clear()
+        self._lines_pos = None
+        if self._readahead is not None:
+            self._readahead.clear()
+        for cache in set([self._block_cache, get_block_cache()]):
+            if cache is not None:
+                cache.invalidate(*self._cache_key)
+        if not self._modified:
+            self._modified = True
+            self._invalidate_disk_cache()
+
+    def _invalidate_disk_cache(self):
+        """Discard the blocks of the file in the disk caches."""
+        # Blocks are validated by size and modification time, which may not
+        # change when a file is modified (e.g. within the same second).
+        self._disk_cache = None
+        disk_cache = self._open_args[0]
+        for cache in set([disk_cache or None, get_disk_cache()]):
+            if cache is not None:
+                cache.invalidate(*self._cache_key)
 
     def close(self):
         """Close the file, including flushing the write buffers.
 
         The file may not be accessed further once it is closed.
         """
+        # A file which was never opened needs no request.
+        self._lazy = False
         if not self.closed:
-            self._file.close()
+            self._lines.clear()
+            if self._readahead is not None:
+                self._readahead.clear()
+            self._finish_checksum()
+            if self._disk_cache is not None:
+                self._disk_cache.flush()
+            try:
+                self._flush_writes()
+            finally:
+                self._file.close()
+            if self._modified:
+                # Blocks may have been cached by readers in the meantime.
+                self._invalidate_disk_cache()
+            if self.verify_checksum and self.checksum is not None:
+                self._verify_checksum()
+
+    def hexdigest(self):
+        """Get the checksum of the data read or written (see ``checksum``).
+
+        Returns ``None`` unless the whole file has been read or written
+        sequentially.
+        """
+        if self._checksum is None or self._checksum_pos != self.size:
+            return None
+        return self._checksum.hexdigest()
+
+    def _finish_checksum(self):
+        """Set the ``checksum`` attribute before closing the file."""
+        value = self.hexdigest()
+        if value is not None:
+            self.checksum = (self._checksum.algorithm, value)
+
+    def _verify_checksum(self):
+        """Compare the computed checksum with the server checksum."""
+        root_url, xpath = self._cache_key
+        statmsg, res = FileSystem(root_url).query(QueryCode.CHECKSUM, xpath)
+        if not statmsg.ok:
+            if statmsg.errno == 3013:
+                raise UnsupportedError(opname="calculate checksum",
+                                       details=statmsg)
+            self._raise_status(self.path, statmsg,
+                               "calculating checksum of")
+
+        algorithm, value = self.checksum
+        server_algorithm, server_value = parse_checksum(res)
+        if server_algorithm != algorithm:
+            raise UnsupportedError(opname="verify {0} checksum against "
+                                   "{1} checksum of server".format(
+                                       algorithm, server_algorithm))
+        if server_value.lower() != value:
+            raise IOError("Checksum mismatch for file {0}: {1} {2} (server: "
+                          "{3})".format(self.path, algorithm, value,
+                                        server_value))
 
     def flush(self):
         """Flush write buffers."""
-        if not self.closed:
-            statmsg, dummy = self._file.sync()
+        if not self.closed and not self._lazy:
+            self._flush_writes()
+            statmsg, dummy = self._request('sync')
             if not statmsg.ok:
                 self._raise_status(self.path, statmsg, "flushing write buffer")
 
+    def close_async(self):
+        """Close the file asynchronously.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` which completes
+            when the file has been closed.
+        """
+        if self._lazy:
+            # A file which was never opened needs no request.
+            self._lazy = False
+            return XRootDFuture.completed()
+        self._lines.clear()
+        if self._readahead is not None:
+            self._readahead.clear()
+        self._finish_checksum()
+        if self._disk_cache is not None:
+            self._disk_cache.flush()
+        self._flush_writes()
+        if self._modified:
+            self._invalidate_disk_cache()
+        return XRootDFuture(
+            errback=lambda statmsg: self._raise_status(
+                self.path, statmsg, "closing"),
+        ).submit(self._file.close)
+
+    def flush_async(self):
+        """Flush write buffers asynchronously.
+
+        :returns: :py:class:`xrootdfs.futures.XRootDFuture` which completes
+            when the write buffers have been flushed.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._ensure_open()
+        self._flush_writes()
+
+        return XRootDFuture(
+            errback=lambda statmsg: self._raise_status(
+                self.path, statmsg, "flushing write buffer"),
+        ).submit(self._file.sync)
+
     def seekable(self):
         """Check if file is seekable."""
         return '-' not in self.mode
@@ -392,13 +1472,17 @@ class XRootDFile(object):
     @property
     def closed(self):
         """Check if file is closed."""
-        return not self._file.is_open()
+        return not self._lazy and not self._file.is_open()
 
     @property
     def size(self):
         """Get file size."""
+        self._ensure_open()
         if self._size == -1:
-            statmsg, res = self._file.stat()
+            # The size is only unknown after modifying the file, in which
+            # case the status information from the open is outdated.
+            self._flush_writes()
+            statmsg, res = self._request('stat', force=True)
             if not statmsg.ok:
                 self._raise_status(self.path, statmsg, "retrieving size")
             self._size = res.size